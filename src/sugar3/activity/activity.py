@@ -258,6 +258,8 @@ class _ActivitySession(GObject.GObject):
 
     def unregister(self, activity):
         self._activities.remove(activity)
+        if activity in self._will_quit:
+            self._will_quit.remove(activity)
 
         if len(self._activities) == 0:
             logging.debug('Quitting the activity process.')
@@ -396,9 +398,10 @@ class Activity(Window, Gtk.Container):
 
         self._session = _get_session()
         self._session.register(self)
-        self._session.connect('quit-requested',
-                              self.__session_quit_requested_cb)
-        self._session.connect('quit', self.__session_quit_cb)
+        self._session_handlers = [
+            self._session.connect('quit-requested',
+                                  self.__session_quit_requested_cb),
+            self._session.connect('quit', self.__session_quit_cb)]
 
         accel_group = Gtk.AccelGroup()
         self.sugar_accel_group = accel_group
@@ -409,9 +412,32 @@ class Activity(Window, Gtk.Container):
 
         share_scope = SCOPE_PRIVATE
 
+        # The journal object and the shared instance are looked up
+        # concurrently, so resuming waits for the slowest call only.
+        lookup = _InitLookup()
+        if handle.object_id:
+            lookup.add_call(datastore.get(
+                handle.object_id,
+                reply_handler=lookup.reply_cb('jobject'),
+                error_handler=lookup.error_cb('jobject')))
+        if not handle.invited:
+            pservice = presenceservice.get_instance()
+            for call in pservice.get_activity_async(
+                    self._activity_id,
+                    reply_handler=lookup.reply_cb('mesh_instance'),
+                    error_handler=lookup.error_cb('mesh_instance')):
+                lookup.add_call(call)
+
+        if not handle.object_id:
+            self._is_resumed = False
+            self._jobject = self._initialize_journal_object()
+            self.set_title(self._jobject.metadata['title'])
+
+        lookup.wait()
+
         if handle.object_id:
             self._is_resumed = True
-            self._jobject = datastore.get(handle.object_id)
+            self._jobject = lookup.get_result('jobject')
 
             if 'share-scope' in self._jobject.metadata:
                 share_scope = self._jobject.metadata['share-scope']
@@ -427,10 +453,6 @@ class Activity(Window, Gtk.Container):
                 self._jobject.metadata['spent-times'] += ', 0'
             else:
                 self._jobject.metadata['spent-times'] = '0'
-        else:
-            self._is_resumed = False
-            self._jobject = self._initialize_journal_object()
-            self.set_title(self._jobject.metadata['title'])
 
         self.shared_activity = None
         self._join_id = None
@@ -447,9 +469,7 @@ class Activity(Window, Gtk.Container):
             # shared activity. http://bugs.sugarlabs.org/ticket/2168
             wait_loop.run()
         else:
-            pservice = presenceservice.get_instance()
-            mesh_instance = pservice.get_activity(self._activity_id,
-                                                  warn_if_none=False)
+            mesh_instance = lookup.get_result('mesh_instance')
             self._set_up_sharing(mesh_instance, share_scope)
 
         if self.shared_activity is not None:
@@ -514,13 +534,21 @@ class Activity(Window, Gtk.Container):
         jobject.metadata['spent-times'] = '0'
         jobject.file_path = ''
 
-        # FIXME: We should be able to get an ID synchronously from the DS,
-        # then call async the actual create.
-        # http://bugs.sugarlabs.org/ticket/2169
-        datastore.write(jobject)
+        # The object id is set once the datastore replied, saves issued
+        # before that are sent then.
+        datastore.write(jobject,
+                        reply_handler=self.__jobject_created_cb,
+                        error_handler=self.__jobject_create_error_cb)
 
         return jobject
 
+    def __jobject_created_cb(self):
+        logging.debug('Activity.__jobject_created_cb')
+
+    def __jobject_create_error_cb(self, err):
+        logging.error('Error creating activity object in datastore: %s' %
+                      err)
+
     def __jobject_updated_cb(self, jobject):
         if self.get_title() == jobject['title']:
             return
@@ -983,16 +1011,11 @@ class Activity(Window, Gtk.Container):
                 self._owns_file = True
                 self._jobject.file_path = file_path
 
-        # Cannot call datastore.write async for creates:
-        # https://dev.laptop.org/ticket/3071
-        if self._jobject.object_id is None:
-            datastore.write(self._jobject, transfer_ownership=True)
-        else:
-            self._updating_jobject = True
-            datastore.write(self._jobject,
-                            transfer_ownership=True,
-                            reply_handler=self.__save_cb,
-                            error_handler=self.__save_error_cb)
+        self._updating_jobject = True
+        datastore.write(self._jobject,
+                        transfer_ownership=True,
+                        reply_handler=self.__save_cb,
+                        error_handler=self.__save_error_cb)
 
     def copy(self):
         '''
@@ -1234,7 +1257,10 @@ class Activity(Window, Gtk.Container):
             self._do_close(False)
 
         if response_id == Gtk.ResponseType.ACCEPT:
-            datastore.delete(self._jobject.get_object_id())
+            # the journal object may still be being created
+            object_id = self._jobject.wait_for_create()
+            if object_id is not None:
+                datastore.delete(object_id)
             self._do_close(True)
 
         if response_id == Gtk.ResponseType.CANCEL:
@@ -1296,6 +1322,10 @@ class Activity(Window, Gtk.Container):
         # Make the exported object inaccessible
         dbus.service.Object.remove_from_connection(self._bus)
 
+        # The session outlives us in a process kept warm
+        for handler_id in self._session_handlers:
+            self._session.disconnect(handler_id)
+        self._session_handlers = []
         self._session.unregister(self)
         power.get_power_manager().shutdown()
 
@@ -1435,6 +1465,47 @@ class Activity(Window, Gtk.Container):
         Gdk.flush()
 
 
+class _InitLookup(object):
+    """Collects the results of asynchronous calls issued together
+
+    wait() blocks on the D-Bus calls added with add_call() until all of
+    them have returned. It doesn't run the main loop, so no events,
+    signals or method calls are dispatched while the activity is still
+    being constructed.
+    """
+
+    def __init__(self):
+        self._calls = []
+        self._results = {}
+        self._errors = {}
+
+    def add_call(self, call):
+        if call is not None:
+            self._calls.append(call)
+
+    def reply_cb(self, key):
+        return partial(self.__reply_cb, key)
+
+    def error_cb(self, key):
+        return partial(self.__error_cb, key)
+
+    def __reply_cb(self, key, result):
+        self._results[key] = result
+
+    def __error_cb(self, key, error):
+        self._errors[key] = error
+
+    def wait(self):
+        calls, self._calls = self._calls, []
+        for call in calls:
+            call.block()
+
+    def get_result(self, key):
+        if key in self._errors:
+            raise self._errors[key]
+        return self._results[key]
+
+
 class _ClientHandler(dbus.service.Object):
     def __init__(self, bundle_id, got_channel_cb):
         self._interfaces = set([CLIENT, CLIENT_HANDLER, PROPERTIES_IFACE])
@@ -28,6 +28,7 @@ from gi.repository import GObject
 from gi.repository import GLib
 
 from sugar3.activity.activityhandle import ActivityHandle
+from sugar3.activity import activityzygote
 from sugar3 import util
 from sugar3 import env
 from sugar3.datastore import datastore
@@ -35,6 +36,8 @@ from sugar3.datastore import datastore
 from errno import EEXIST, ENOSPC
 
 import os
+import re
+import collections
 import subprocess
 
 _SHELL_SERVICE = 'org.laptop.Shell'
@@ -131,17 +134,111 @@ def get_command(activity, activity_id=None, object_id=None, uri=None,
     return command
 
 
+_MAX_BUNDLE_LOGS = 20
+_MAX_BUNDLE_LOGS_SIZE = 4 * 1024 * 1024
+
+
+class _BundleLogs(object):
+    """Log files allocated for a bundle during this session
+
+    The existing logs are listed once, then the next index is kept in
+    memory so allocating a log file doesn't probe all the previous ones.
+    The oldest logs of finished activities are removed when the bundle
+    has more than _MAX_BUNDLE_LOGS of them or they use more than
+    _MAX_BUNDLE_LOGS_SIZE bytes.
+    """
+
+    def __init__(self, bundle_id):
+        self.bundle_id = bundle_id
+        self.active = set()
+
+        pattern = re.compile(r'^%s-(\d+)\.log$' % re.escape(bundle_id))
+        indexes = []
+        try:
+            for name in os.listdir(env.get_logs_path()):
+                match = pattern.match(name)
+                if match:
+                    indexes.append(int(match.group(1)))
+        except OSError:
+            pass
+        indexes.sort()
+
+        self.paths = collections.deque(
+            [self._get_path(index) for index in indexes])
+        self.next_index = indexes[-1] + 1 if indexes else 1
+
+    def _get_path(self, index):
+        return env.get_logs_path('%s-%s.log' % (self.bundle_id, index))
+
+    def allocate_path(self):
+        path = self._get_path(self.next_index)
+        self.next_index += 1
+        return path
+
+    def add(self, path):
+        self.paths.append(path)
+        self.active.add(path)
+        self._rotate()
+
+    def _rotate(self):
+        sizes = []
+        for path in self.paths:
+            try:
+                sizes.append(os.stat(path).st_size)
+            except OSError:
+                sizes.append(None)
+
+        count = len([size for size in sizes if size is not None])
+        total_size = sum([size for size in sizes if size is not None])
+
+        kept = collections.deque()
+        for path, size in zip(self.paths, sizes):
+            if size is None:
+                continue
+            too_many = count > _MAX_BUNDLE_LOGS
+            too_big = total_size > _MAX_BUNDLE_LOGS_SIZE
+            if (too_many or too_big) and path not in self.active:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logging.warning('Could not remove old log %s: %s' %
+                                    (path, e))
+                    kept.append(path)
+                else:
+                    count -= 1
+                    total_size -= size
+            else:
+                kept.append(path)
+        self.paths = kept
+
+
+_bundle_logs = {}
+
+
+def _get_bundle_logs(bundle_id):
+    if bundle_id not in _bundle_logs:
+        _bundle_logs[bundle_id] = _BundleLogs(bundle_id)
+    return _bundle_logs[bundle_id]
+
+
+def _release_log_file(log_path):
+    for bundle_logs in _bundle_logs.values():
+        bundle_logs.active.discard(log_path)
+
+
 def open_log_file(activity):
-    i = 1
+    bundle_logs = _get_bundle_logs(activity.get_bundle_id())
     while True:
-        path = env.get_logs_path('%s-%s.log' % (activity.get_bundle_id(), i))
+        path = bundle_logs.allocate_path()
         try:
             fd = os.open(path, os.O_EXCL | os.O_CREAT | os.O_WRONLY, 0o644)
             f = os.fdopen(fd, 'w')
+            bundle_logs.add(path)
             return (path, f)
         except OSError as e:
             if e.errno == EEXIST:
-                i += 1
+                # created behind our back, try the next index
+                pass
             elif e.errno == ENOSPC:
                 # not the end of the world; let's try to keep going.
                 return ('/dev/null', open('/dev/null', 'w'))
@@ -225,6 +322,21 @@ class ActivityCreationHandler(GObject.GObject):
                               self._handle.invited)
 
         dev_null = open('/dev/null', 'r')
+        if activityzygote.can_launch(command):
+            try:
+                pid, connection = activityzygote.launch(
+                    [str(s) for s in command], str(self._bundle.get_path()),
+                    environ, dev_null.fileno(), log_file.fileno(),
+                    log_file.fileno())
+            except (OSError, ValueError) as e:
+                logging.warning('Activity zygote launch failed, spawning '
+                                'a new process: %s' % e)
+            else:
+                activityzygote.child_watch_add(
+                    connection, pid, _child_watch_cb,
+                    (log_file, log_path, self._handle.activity_id, False))
+                return
+
         child = subprocess.Popen([str(s) for s in command],
                                  env=environ,
                                  cwd=str(self._bundle.get_path()),
@@ -235,7 +347,8 @@ class ActivityCreationHandler(GObject.GObject):
 
         GLib.child_watch_add(child.pid,
                              _child_watch_cb,
-                             (log_file, self._handle.activity_id))
+                             (log_file, log_path, self._handle.activity_id,
+                              True))
 
     def _no_reply_handler(self, *args):
         pass
@@ -296,7 +409,7 @@ def create_with_object_id(bundle, object_id):
 
 
 def _child_watch_cb(pid, condition, user_data):
-    log_file, activity_id = user_data
+    log_file, log_path, activity_id, is_child = user_data
 
     if os.WIFEXITED(condition):
         status = os.WEXITSTATUS(condition)
@@ -319,13 +432,17 @@ def _child_watch_cb(pid, condition, user_data):
             '%s, pid %s activity_id %s\n' % (message, pid, activity_id))
     finally:
         log_file.close()
+        _release_log_file(log_path)
 
-    # try to reap zombies in case SIGCHLD has not been set to SIG_IGN
-    try:
-        os.waitpid(pid, 0)
-    except OSError:
-        # SIGCHLD = SIG_IGN, no zombies
-        pass
+    # try to reap zombies in case SIGCHLD has not been set to SIG_IGN;
+    # the zygote reaps the activities it forked, and their pid may
+    # since have been reused by a child of ours
+    if is_child:
+        try:
+            os.waitpid(pid, 0)
+        except OSError:
+            # SIGCHLD = SIG_IGN, no zombies
+            pass
 
     if status or signum:
         # XXX have to recreate dbus object since we can't reuse
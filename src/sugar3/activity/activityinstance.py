@@ -32,6 +32,7 @@ import dbus
 import dbus.service
 from dbus.mainloop.glib import DBusGMainLoop
 DBusGMainLoop(set_as_default=True)
+from gi.repository import GLib
 
 from sugar3.activity import activityhandle
 from sugar3 import config
@@ -42,10 +43,16 @@ from sugar3.bundle.bundle import MalformedBundleException
 
 from errno import EEXIST
 
+import gc
 import time
 import hashlib
 import random
 
+# Seconds an idle single process stays warm after its last instance
+# was closed, and the resident memory (in MiB) above which it won't.
+_POOL_IDLE_TIMEOUT = 900
+_POOL_MAX_MEMORY = 150
+
 
 def _makedirs(path):
     try:
@@ -69,20 +76,128 @@ def get_single_process_path(bundle_id):
     return '/' + bundle_id.replace('.', '/')
 
 
+def _get_pool_setting(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logging.warning('Invalid value %r for %s, using %d' %
+                        (value, name, default))
+        return default
+
+
+def _get_resident_memory():
+    """Resident memory of this process in bytes, or 0 if unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (IOError, OSError, ValueError, IndexError):
+        return 0
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
 class SingleProcess(dbus.service.Object):
 
     def __init__(self, name_service, constructor):
         self.constructor = constructor
+        self._idle_loop = None
+        self._idle_instance = None
 
         bus = dbus.SessionBus()
-        bus_name = dbus.service.BusName(name_service, bus=bus)
+        self._bus_name = dbus.service.BusName(name_service, bus=bus)
         object_path = get_single_process_path(name_service)
-        dbus.service.Object.__init__(self, bus_name, object_path)
+        dbus.service.Object.__init__(self, self._bus_name, object_path)
 
     @dbus.service.method('org.laptop.SingleProcess', in_signature='a{sv}')
     def create(self, handle_dict):
         handle = activityhandle.create_from_dict(handle_dict)
-        create_activity_instance(self.constructor, handle)
+        instance = create_activity_instance(self.constructor, handle)
+        if self._idle_loop is not None:
+            self._idle_instance = instance
+            self._idle_loop.quit()
+
+    def wait_for_create(self, idle_timeout, max_memory):
+        """Keep the process warm until the next create() call
+
+        Returns the instance created by that call, or None if the
+        process should exit because it stayed idle for idle_timeout
+        seconds or uses more than max_memory MiB.
+        """
+        gc.collect()
+        memory = _get_resident_memory()
+        if max_memory > 0 and memory > max_memory * 1024 * 1024:
+            logging.debug('Not keeping the process warm, it uses %d MiB' %
+                          (memory // (1024 * 1024)))
+            self._release()
+            return None
+
+        logging.debug('Keeping the process warm for %d seconds' %
+                      idle_timeout)
+        self._idle_instance = None
+        self._idle_loop = GLib.MainLoop()
+        timeout_id = None
+        if idle_timeout > 0:
+            timeout_id = GLib.timeout_add_seconds(idle_timeout,
+                                                  self.__idle_timeout_cb)
+
+        # Without instances there is nothing to save at logout
+        from sugar3.activity import activity
+        session = activity._get_session()
+        session_handlers = [
+            session.connect('quit-requested',
+                            self.__session_quit_requested_cb),
+            session.connect('quit', self.__session_quit_cb)]
+        try:
+            self._idle_loop.run()
+        finally:
+            for handler_id in session_handlers:
+                session.disconnect(handler_id)
+        self._idle_loop = None
+
+        if self._idle_instance is None:
+            logging.debug('Reaping the idle process')
+            self._release()
+            return None
+
+        if timeout_id is not None:
+            GLib.source_remove(timeout_id)
+        return self._idle_instance
+
+    def __idle_timeout_cb(self):
+        self._idle_loop.quit()
+        return False
+
+    def __session_quit_requested_cb(self, session):
+        session.will_quit(self, True)
+
+    def __session_quit_cb(self, session):
+        self._idle_loop.quit()
+
+    def _release(self):
+        # give the name up before exiting, so that new launches don't
+        # try to reuse this process
+        self.remove_from_connection()
+        bus = self._bus_name.get_bus()
+        bus.release_name(self._bus_name.get_name())
+
+
+def _create_in_single_process(service_name, service_path, handle):
+    """Ask the single process owning service_name to create the instance
+
+    Returns False if it could not be reached, then the instance has to
+    be created in a new process, which doesn't serve later launches.
+    """
+    try:
+        remote = dbus.SessionBus().get_object(service_name, service_path)
+        remote.create(handle.get_dict(),
+                      dbus_interface='org.laptop.SingleProcess')
+    except (TypeError, dbus.DBusException):
+        print('Could not communicate with the instance process,'
+              'launching a new process')
+        return False
+    return True
 
 
 def main():
@@ -108,7 +223,11 @@ def main():
                         action='store_true', default=False,
                         help='the activity is being launched for handling an '
                              'invite from the network')
-    
+    parser.add_argument('-w', '--warm', dest='warm',
+                        action='store_true', default=False,
+                        help='start a single process without any instance '
+                             'and keep it warm for the next launches')
+
     options, args = parser.parse_known_args()
 
     logger.start()
@@ -195,7 +314,20 @@ def main():
         object_id=options.object_id, uri=options.uri,
         invited=options.invited)
 
-    if options.single_process is True:
+    # An idle single process stays around for the next launches when
+    # SUGAR_ACTIVITY_POOL_IDLE_TIMEOUT is set or it was started warm.
+    single_process = None
+    pool_enabled = options.warm or \
+        'SUGAR_ACTIVITY_POOL_IDLE_TIMEOUT' in os.environ
+    pool_idle_timeout = _get_pool_setting('SUGAR_ACTIVITY_POOL_IDLE_TIMEOUT',
+                                          _POOL_IDLE_TIMEOUT)
+    pool_max_memory = _get_pool_setting('SUGAR_ACTIVITY_POOL_MAX_MEMORY',
+                                        _POOL_MAX_MEMORY)
+
+    if options.single_process is True or options.warm:
+        if not options.bundle_id:
+            options.bundle_id = bundle.get_bundle_id()
+
         sessionbus = dbus.SessionBus()
 
         service_name = get_single_process_name(options.bundle_id)
@@ -210,25 +342,30 @@ def main():
             name = None
 
         if not name:
-            SingleProcess(service_name, activity_constructor)
-        else:
-            try:
-                single_process = sessionbus.get_object(service_name,
-                                                       service_path)
-                single_process.create(
-                    activity_handle.get_dict(),
-                    dbus_interface='org.laptop.SingleProcess')
-
-                print('Created %s in a single process.' % service_name)
-                sys.exit(0)
-            except (TypeError, dbus.DBusException):
-                print('Could not communicate with the instance process,'
-                      'launching a new process')
+            single_process = SingleProcess(service_name, activity_constructor)
+        elif options.warm:
+            print('%s is already running in a single process.' %
+                  service_name)
+            sys.exit(0)
+        elif _create_in_single_process(service_name, service_path,
+                                       activity_handle):
+            print('Created %s in a single process.' % service_name)
+            sys.exit(0)
 
     if hasattr(module, 'start'):
         module.start()
 
-    instance = create_activity_instance(activity_constructor, activity_handle)
+    if options.warm:
+        instance = single_process.wait_for_create(pool_idle_timeout,
+                                                  pool_max_memory)
+    else:
+        instance = create_activity_instance(activity_constructor,
+                                            activity_handle)
 
-    if hasattr(instance, 'run_main_loop'):
+    while hasattr(instance, 'run_main_loop'):
         instance.run_main_loop()
+
+        if single_process is None or not pool_enabled:
+            break
+        instance = single_process.wait_for_create(pool_idle_timeout,
+                                                  pool_max_memory)
@@ -0,0 +1,328 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""Preloading launcher for activities started with sugar-activity3
+
+UNSTABLE. The zygote is an opt-in service, started with the
+sugar-activity-zygote script. It imports the toolkit once and then
+forks a child per launch request, so activities don't pay for the
+imports at every start.
+
+Modules that open a display or bus connection at import time (Gtk,
+Gdk and the modules using them) are not preloaded, as such a connection
+can't be shared by the forked children.
+
+When the zygote is not running, or the activity is not started with
+sugar-activity3, :mod:`sugar3.activity.activityfactory` spawns the
+activity as usual.
+"""
+
+import array
+import atexit
+import importlib
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import struct
+import sys
+import traceback
+
+from gi.repository import GLib
+
+from sugar3 import env
+
+_SOCKET_NAME = 'activity-zygote'
+_LAUNCHER = 'sugar-activity3'
+_REQUEST_TIMEOUT = 5
+
+_PRELOAD_MODULES = [
+    'dbus',
+    'dbus.service',
+    'dbus.mainloop.glib',
+    'cairo',
+    'gi.repository.GObject',
+    'gi.repository.Gio',
+    'sugar3.activity.activityinstance',
+    'sugar3.datastore.datastore',
+    'sugar3.mime',
+    'sugar3.presence.presenceservice',
+    'sugar3.profile',
+]
+
+_HEADER = struct.Struct('!I')
+_FDS_SIZE = 3 * array.array('i').itemsize
+
+# Wait status reported when the zygote can't tell how an activity
+# exited, as if it had exited with status 255
+_UNKNOWN_STATUS = 255 << 8
+
+
+def get_socket_path():
+    return env.get_profile_path(_SOCKET_NAME)
+
+
+def can_launch(command):
+    """Whether the zygote is running and can start this command"""
+    if os.path.basename(command[0]) != _LAUNCHER:
+        return False
+    return os.path.exists(get_socket_path())
+
+
+def launch(command, cwd, environ, stdin, stdout, stderr):
+    """Ask the zygote to start an activity
+
+    Returns the pid of the activity process and the connection
+    to the zygote, to be passed to child_watch_add().
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.settimeout(_REQUEST_TIMEOUT)
+        connection.connect(get_socket_path())
+
+        payload = json.dumps({'command': command,
+                              'cwd': cwd,
+                              'environ': environ}).encode('utf-8')
+        fds = array.array('i', [stdin, stdout, stderr])
+        connection.sendmsg([_HEADER.pack(len(payload)) + payload],
+                           [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+
+        pid = int(_read_line(connection))
+        connection.settimeout(None)
+    except BaseException:
+        connection.close()
+        raise
+
+    return pid, connection
+
+
+def child_watch_add(connection, pid, callback, user_data=None):
+    """Call callback(pid, status, user_data) when the activity exits,
+    like GLib.child_watch_add() does for our own children"""
+
+    def __status_cb(fd, condition):
+        try:
+            status = int(_read_line(connection))
+        except (OSError, ValueError):
+            logging.warning('Lost connection to the zygote, the exit status '
+                            'of pid %s is unknown', pid)
+            status = _UNKNOWN_STATUS
+        connection.close()
+        callback(pid, status, user_data)
+        return False
+
+    GLib.io_add_watch(connection.fileno(), GLib.PRIORITY_DEFAULT,
+                      GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+                      __status_cb)
+
+
+def _read_line(connection):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(1)
+        if not chunk:
+            raise ValueError('Connection closed by the zygote')
+        data += chunk
+    return data.decode('ascii')
+
+
+def _receive_request(connection):
+    data, ancdata, flags, address = connection.recvmsg(
+        65536, socket.CMSG_SPACE(_FDS_SIZE))
+
+    fds = array.array('i')
+    for level, kind, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            size = len(cmsg_data) - len(cmsg_data) % fds.itemsize
+            fds.frombytes(cmsg_data[:size])
+    if len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError('Expected 3 file descriptors, got %d' % len(fds))
+
+    try:
+        while len(data) < _HEADER.size:
+            data += connection.recv(65536)
+        length = _HEADER.unpack(data[:_HEADER.size])[0]
+        data = data[_HEADER.size:]
+        while len(data) < length:
+            chunk = connection.recv(65536)
+            if not chunk:
+                raise ValueError('Truncated launch request')
+            data += chunk
+        request = json.loads(data.decode('utf-8'))
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+
+    return request['command'], request['cwd'], request['environ'], list(fds)
+
+
+def preload():
+    for module_name in _PRELOAD_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception:
+            logging.exception('Could not preload %s', module_name)
+
+
+def _run_child(command, cwd, environ, fds, inherited):
+    code = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for obj in inherited:
+            obj.close()
+
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        for fd in fds:
+            if fd > 2:
+                os.close(fd)
+
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+        sys.argv = command
+
+        from sugar3.activity import activityinstance
+        activityinstance.main()
+        code = 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            atexit._run_exitfuncs()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _reap_children(children):
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+        connection = children.pop(pid, None)
+        if connection is None:
+            continue
+        try:
+            connection.sendall(b'%d\n' % status)
+        except OSError:
+            # the shell went away, nobody is waiting for this one
+            pass
+        connection.close()
+
+
+def _terminate_cb(signum, frame):
+    sys.exit(0)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    socket_path = get_socket_path()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.connect(socket_path)
+    except OSError:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    else:
+        logging.error('An activity zygote is already running')
+        sys.exit(1)
+    server.close()
+
+    preload()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(16)
+
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.signal(signal.SIGTERM, _terminate_cb)
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    selector.register(wakeup_read, selectors.EVENT_READ)
+
+    children = {}
+    logging.info('Activity zygote listening on %s', socket_path)
+
+    try:
+        while True:
+            for key, events in selector.select():
+                if key.fileobj == wakeup_read:
+                    try:
+                        while os.read(wakeup_read, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    _reap_children(children)
+                    continue
+
+                connection, address = server.accept()
+                connection.settimeout(_REQUEST_TIMEOUT)
+                try:
+                    command, cwd, environ, fds = \
+                        _receive_request(connection)
+                except (OSError, ValueError, KeyError) as e:
+                    logging.error('Invalid launch request: %s', e)
+                    connection.close()
+                    continue
+
+                inherited = [server, selector, connection] + \
+                    list(children.values())
+                pid = os.fork()
+                if pid == 0:
+                    os.close(wakeup_read)
+                    os.close(wakeup_write)
+                    _run_child(command, cwd, environ, fds, inherited)
+
+                for fd in fds:
+                    os.close(fd)
+                logging.info('Launched %r as pid %d', command, pid)
+
+                children[pid] = connection
+                try:
+                    connection.sendall(b'%d\n' % pid)
+                except OSError:
+                    logging.warning('Could not notify the launch of %d', pid)
+                _reap_children(children)
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
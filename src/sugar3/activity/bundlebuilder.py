@@ -47,9 +47,13 @@ from six.moves.html_parser import HTMLParser
 
 from sugar3 import env
 from sugar3.bundle.activitybundle import ActivityBundle
+from sugar3.bundle.bundle import MalformedBundleException, MANIFEST_NAME, \
+    hash_file, parse_manifest, format_manifest
 from six.moves import reduce
 
 
+MANIFEST_PATH = 'activity/' + MANIFEST_NAME
+
 IGNORE_DIRS = ['dist', '.git', 'screenshots']
 IGNORE_FILES = ['.gitignore', 'MANIFEST', '*.pyc', '*~', '*.bak', 'pseudo.po']
 
@@ -237,28 +241,62 @@ class Packager(object):
 
 
 class XOPackager(Packager):
+    """Packages the activity as a .xo bundle, with a manifest of the
+    digests of its files in activity/contents.
 
-    def __init__(self, builder):
+    Given the path of a previous .xo of the activity as base_path, it
+    makes a delta bundle instead, leaving out the files unchanged since
+    that version, but those of the activity directory. Such a bundle
+    can only be installed over that version.
+    """
+
+    def __init__(self, builder, base_path=None):
         Packager.__init__(self, builder.config)
 
         self.builder = builder
         self.builder.build_locale()
-        self.package_path = os.path.join(self.config.dist_dir,
-                                         self.config.xo_name)
+        self.base_path = base_path
+        if base_path is None:
+            xo_name = self.config.xo_name
+        else:
+            xo_name = '%s-delta.xo' % os.path.splitext(self.config.xo_name)[0]
+        self.package_path = os.path.join(self.config.dist_dir, xo_name)
+
+    def _get_base_manifest(self):
+        if self.base_path is None:
+            return {}
+        base = ActivityBundle(self.base_path, translated=False)
+        data = base.get_file_data(MANIFEST_PATH)
+        if data is None:
+            raise MalformedBundleException(
+                '%s has no manifest, cannot make a delta bundle from it' %
+                self.base_path)
+        return parse_manifest(data)
 
     def package(self):
+        base_manifest = self._get_base_manifest()
+        manifest = {}
+
+        files = [(os.path.join(self.config.source_dir, f), f)
+                 for f in self.get_files_in_git() if f != MANIFEST_PATH]
+        for f in self.builder.get_locale_files():
+            files.append((os.path.join(self.builder.locale_dir, f),
+                          os.path.join('locale', f)))
+
         bundle_zip = zipfile.ZipFile(self.package_path, 'w',
                                      zipfile.ZIP_DEFLATED)
 
-        for f in self.get_files_in_git():
-            bundle_zip.write(os.path.join(self.config.source_dir, f),
-                             os.path.join(self.config.bundle_root_dir, f))
-
-        for f in self.builder.get_locale_files():
-            bundle_zip.write(os.path.join(self.builder.locale_dir, f),
-                             os.path.join(self.config.bundle_root_dir,
-                                          'locale', f))
+        for path, name in files:
+            manifest[name] = hash_file(path)
+            if base_manifest.get(name) == manifest[name] and \
+                    not name.startswith('activity/'):
+                continue
+            bundle_zip.write(path,
+                             os.path.join(self.config.bundle_root_dir, name))
 
+        bundle_zip.writestr(os.path.join(self.config.bundle_root_dir,
+                                         MANIFEST_PATH),
+                            format_manifest(manifest))
         bundle_zip.close()
 
 
@@ -497,7 +535,11 @@ def cmd_dist_xo(config, options):
     if options is not None:
         no_fail = options.no_fail
 
-    packager = XOPackager(Builder(config, no_fail))
+    base_path = None
+    if options is not None:
+        base_path = options.delta_from
+
+    packager = XOPackager(Builder(config, no_fail), base_path)
     packager.package()
 
 
@@ -636,6 +678,10 @@ def start():
     dist_parser.add_argument(
         "--no-fail", dest="no_fail", action="store_true", default=False,
         help="continue past failure when building xo file")
+    dist_parser.add_argument(
+        "--delta-from", dest="delta_from", default=None,
+        help="make a delta bundle, without the files unchanged since the "
+        "given xo bundle")
 
     subparsers.add_parser("dist_source", help="Create a tar source package")
     subparsers.add_parser("build", help="Build generated files")
@@ -23,19 +23,113 @@ UNSTABLE.
 from six.moves.configparser import ConfigParser, ParsingError
 import six
 from locale import normalize
+from collections import OrderedDict
+from contextlib import contextmanager
 import os
-import shutil
-import tempfile
 import logging
+import subprocess
+import threading
 
 from sugar3 import env
+from sugar3.bundle import bundleindex
 from sugar3.bundle.bundle import Bundle, \
-    MalformedBundleException, NotInstalledException
+    MalformedBundleException, NotInstalledException, move_to_trash
 from sugar3.bundle.bundleversion import NormalizedVersion
 from sugar3.bundle.bundleversion import InvalidVersionError
 
 
-_bundle_instances = {}
+# ActivityBundle instances by path, least recently used first
+_bundle_instances = OrderedDict()
+_MAX_BUNDLE_INSTANCES = 64
+
+
+def _cache_bundle_instance(path, bundle):
+    _bundle_instances[path] = bundle
+    _bundle_instances.move_to_end(path)
+    while len(_bundle_instances) > _MAX_BUNDLE_INSTANCES:
+        path_, evicted = _bundle_instances.popitem(last=False)
+        evicted.close()
+
+
+# (key in the bundle index, ActivityBundle attribute)
+_INDEXED_INFO = [
+    ('bundle_id', '_bundle_id'),
+    ('name', '_name'),
+    ('exec', 'bundle_exec'),
+    ('icon', '_icon'),
+    ('mime_types', '_mime_types'),
+    ('show_launcher', '_show_launcher'),
+    ('tags', '_tags'),
+    ('activity_version', '_activity_version'),
+    ('summary', '_summary'),
+    ('description', '_description'),
+    ('single_instance', '_single_instance'),
+    ('max_participants', '_max_participants'),
+]
+
+_INDEXED_LINFO = [
+    ('name', '_name'),
+    ('summary', '_summary'),
+    ('tags', '_tags'),
+]
+
+
+def _copy_indexed(value):
+    # the index and the bundles must not share the lists of values
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+# Directories whose MIME cache is rebuilt when the outermost
+# mime_database_batch() ends
+_mime_batch_depth = 0
+_pending_mime_dirs = set()
+
+
+def _run_update_mime_database(mime_dir):
+    try:
+        subprocess.call(['update-mime-database', mime_dir])
+    except OSError as e:
+        logging.error('Could not run update-mime-database: %s', e)
+
+
+def _update_mime_database(mime_dir, wait=True):
+    if _mime_batch_depth > 0:
+        _pending_mime_dirs.add(mime_dir)
+    elif wait:
+        _run_update_mime_database(mime_dir)
+    else:
+        threading.Thread(target=_run_update_mime_database,
+                         args=(mime_dir,)).start()
+
+
+@contextmanager
+def mime_database_batch(wait=False):
+    """Rebuild the MIME database once for all the bundles installed or
+    uninstalled in the block, instead of once per bundle:
+
+        with mime_database_batch():
+            for bundle in bundles:
+                bundle.install()
+
+    The mimetypes.xml and icon links are updated as each bundle is
+    installed, only update-mime-database is deferred. Unless wait is
+    True, it runs in the background when the block ends. Batches can
+    be nested, the outermost one runs it.
+    """
+    global _mime_batch_depth
+
+    _mime_batch_depth += 1
+    try:
+        yield
+    finally:
+        _mime_batch_depth -= 1
+        if _mime_batch_depth == 0:
+            mime_dirs = list(_pending_mime_dirs)
+            _pending_mime_dirs.clear()
+            for mime_dir in mime_dirs:
+                _update_mime_database(mime_dir, wait)
 
 
 def _expand_lang(locale):
@@ -87,6 +181,39 @@ def _expand_lang(locale):
     return ret
 
 
+_LANGUAGE_ENVARS = ('LANGUAGE', 'LC_ALL', 'LC_MESSAGES', 'LANG')
+
+# (values of _LANGUAGE_ENVARS, languages negotiated from them)
+_languages = (None, None)
+
+
+def _get_languages():
+    """Get the languages to look for translations in, best first. They
+    are negotiated once and reused until the environment changes."""
+    global _languages
+
+    environ = tuple([os.environ.get(envar) for envar in _LANGUAGE_ENVARS])
+    if environ == _languages[0]:
+        return _languages[1]
+
+    # Using method from gettext.py, first find languages from environ
+    languages = []
+    for val in environ:
+        if val:
+            languages = val.split(':')
+            break
+
+    # Next, normalize and expand the languages
+    nelangs = []
+    for lang in languages:
+        for nelang in _expand_lang(lang):
+            if nelang not in nelangs:
+                nelangs.append(nelang)
+
+    _languages = (environ, tuple(nelangs))
+    return _languages[1]
+
+
 class ActivityBundle(Bundle):
     """A Sugar activity bundle
 
@@ -116,17 +243,59 @@ class ActivityBundle(Bundle):
         self._single_instance = False
         self._max_participants = 0
 
-        info_file = self.get_file('activity/activity.info')
-        if info_file is None:
-            raise MalformedBundleException('No activity.info file')
-        self._parse_info(info_file)
+        # only installed bundles are indexed, see bundleindex
+        info = None
+        if self._zip_file is None:
+            info_path = os.path.join(path, 'activity', 'activity.info')
+            info = bundleindex.get_info(path, info_path)
+
+        if info is not None:
+            self._set_indexed(_INDEXED_INFO, info)
+        else:
+            info_file = self.get_file('activity/activity.info')
+            if info_file is None:
+                raise MalformedBundleException('No activity.info file')
+            with info_file:
+                self._parse_info(info_file)
+            if self._zip_file is None:
+                bundleindex.set_info(path, info_path,
+                                     self._get_indexed(_INDEXED_INFO))
 
         if translated:
-            linfo_file = self._get_linfo_file()
-            if linfo_file:
-                self._parse_linfo(linfo_file)
+            self._translate()
+
+        _cache_bundle_instance(path, self)
+
+    def _get_indexed(self, keys):
+        return dict([(key, _copy_indexed(getattr(self, attribute)))
+                     for key, attribute in keys])
+
+    def _set_indexed(self, keys, values):
+        for key, attribute in keys:
+            setattr(self, attribute, _copy_indexed(values[key]))
+
+    def _translate(self):
+        linfo_path = self._get_linfo_path()
+        if linfo_path is None:
+            return
+
+        if self._zip_file is None:
+            full_linfo_path = os.path.join(self._path, linfo_path)
+            strings = bundleindex.get_translations(self._path,
+                                                   full_linfo_path)
+            if strings is not None:
+                self._set_indexed(_INDEXED_LINFO, strings)
+                return
+
+        linfo_file = self.get_file(linfo_path)
+        if linfo_file is None:
+            return
+        with linfo_file:
+            self._parse_linfo(linfo_file)
 
-        _bundle_instances[path] = self
+        if self._zip_file is None:
+            bundleindex.set_translations(self._path, full_linfo_path,
+                                         self._get_indexed(_INDEXED_LINFO))
 
     def _parse_info(self, info_file):
         cp = ConfigParser()
@@ -228,28 +397,22 @@ class ActivityBundle(Bundle):
                 'Activity bundle %s does not specify a license' %
                 self.get_path())
 
-    def _get_linfo_file(self):
-        # Using method from gettext.py, first find languages from environ
-        languages = []
-        for envar in ('LANGUAGE', 'LC_ALL', 'LC_MESSAGES', 'LANG'):
-            val = os.environ.get(envar)
-            if val:
-                languages = val.split(':')
-                break
-
-        # Next, normalize and expand the languages
-        nelangs = []
-        for lang in languages:
-            for nelang in _expand_lang(lang):
-                if nelang not in nelangs:
-                    nelangs.append(nelang)
+    def _get_linfo_path(self):
+        languages = _get_languages()
 
-        # Finally, select a language
-        for lang in nelangs:
+        # One listing of the locale directory rules out most languages
+        # without probing for their activity.linfo
+        if self._zip_file is None:
+            try:
+                locales = set(os.listdir(os.path.join(self._path, 'locale')))
+            except OSError:
+                return None
+            languages = [lang for lang in languages if lang in locales]
+
+        for lang in languages:
             linfo_path = os.path.join('locale', lang, 'activity.linfo')
-            linfo_file = self.get_file(linfo_path)
-            if linfo_file is not None:
-                return linfo_file
+            if self.is_file(linfo_path):
+                return linfo_path
         return None
 
     def _parse_linfo(self, linfo_file):
@@ -296,19 +459,17 @@ class ActivityBundle(Bundle):
         return self._bundle_id
 
     def get_icon(self):
-        """Get the activity icon name"""
-        # FIXME: this should return the icon data, not a filename, so that
-        # we don't need to create a temp file in the zip case
+        """Get the path of the activity icon"""
         icon_path = os.path.join('activity', self._icon + '.svg')
         if self._zip_file is None:
             return os.path.join(self.get_path(), icon_path)
         else:
-            icon_data = self.get_file(icon_path).read()
-            temp_file, temp_file_path = tempfile.mkstemp(prefix=self._icon,
-                                                         suffix='.svg')
-            os.write(temp_file, icon_data)
-            os.close(temp_file)
-            return temp_file_path
+            return self.get_file_path(icon_path)
+
+    def get_icon_data(self):
+        """Get the SVG data of the activity icon"""
+        return self.get_file_data(os.path.join('activity',
+                                               self._icon + '.svg'))
 
     def get_icon_filename(self):
         '''Get the icon file name'''
@@ -354,10 +515,10 @@ class ActivityBundle(Bundle):
         """Get whether there should be a visible launcher for the activity"""
         return self._show_launcher
 
-    def install(self):
+    def install(self, progress_cb=None):
         install_dir = env.get_user_activities_path()
 
-        self._unzip(install_dir)
+        self._unzip(install_dir, progress_cb)
 
         install_path = os.path.join(install_dir, self._zip_root_dir)
         self.install_mime_type(install_path)
@@ -379,8 +540,7 @@ class ActivityBundle(Bundle):
             installed_mime_path = os.path.join(mime_pkg_dir,
                                                '%s.xml' % self._bundle_id)
             self._symlink(mime_path, installed_mime_path)
-            os.spawnlp(os.P_WAIT, 'update-mime-database',
-                       'update-mime-database', mime_dir)
+            _update_mime_database(mime_dir)
 
         mime_types = self.get_mime_types()
         if mime_types is not None:
@@ -431,8 +591,7 @@ class ActivityBundle(Bundle):
                                            '%s.xml' % self._bundle_id)
         if os.path.exists(installed_mime_path):
             os.remove(installed_mime_path)
-            os.spawnlp(os.P_WAIT, 'update-mime-database',
-                       'update-mime-database', mime_dir)
+            _update_mime_database(mime_dir)
 
         mime_types = self.get_mime_types()
         if mime_types is not None:
@@ -450,16 +609,29 @@ class ActivityBundle(Bundle):
             bundle_profile_path = env.get_profile_path(self._bundle_id)
             if os.path.exists(bundle_profile_path):
                 os.chmod(bundle_profile_path, 0o775)
-                shutil.rmtree(bundle_profile_path, ignore_errors=True)
+                move_to_trash(bundle_profile_path)
 
         self._uninstall(install_path)
+        bundleindex.remove(install_path)
 
     def is_user_activity(self):
         return self.get_path().startswith(env.get_user_activities_path())
 
 
 def get_bundle_instance(path, translated=True):
-    global _bundle_instances
-    if path not in _bundle_instances:
-        _bundle_instances[path] = ActivityBundle(path, translated=translated)
-    return _bundle_instances[path]
+    """Get the ActivityBundle for path, reusing the one created last
+    unless the bundle was modified since. Only the most recently used
+    bundles are kept, the zip files of the others are closed."""
+    bundle = _bundle_instances.get(path)
+    if bundle is not None:
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == bundle.get_installation_time():
+            _bundle_instances.move_to_end(path)
+            return bundle
+        del _bundle_instances[path]
+        bundle.close()
+
+    return ActivityBundle(path, translated=translated)
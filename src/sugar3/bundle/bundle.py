@@ -20,12 +20,16 @@
 UNSTABLE.
 """
 
-import six
 import os
+import stat
+import atexit
+import hashlib
 import logging
 import shutil
+import tempfile
+import threading
 import zipfile
-import subprocess
+import concurrent.futures
 
 
 class AlreadyInstalledException(Exception):
@@ -52,6 +56,86 @@ class MalformedBundleException(Exception):
     pass
 
 
+_EXTRACT_WORKERS = 4
+_EXTRACT_BUFFER_SIZE = 1024 * 1024
+
+_TRASH_PREFIX = '.trash-'
+
+# Name of the manifest in the info directory of a bundle, see
+# parse_manifest()
+MANIFEST_NAME = 'contents'
+
+# Members of zipped bundles handed out as files, see Bundle.get_file_path()
+_extracted_dir = None
+
+
+def _remove_extracted_dir():
+    if _extracted_dir is not None:
+        shutil.rmtree(_extracted_dir, ignore_errors=True)
+
+
+def hash_file(path):
+    """Get the SHA-256 digest of a file, as used in manifests"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_EXTRACT_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_manifest(data):
+    """Parse the manifest of a bundle, which lists the SHA-256 digest
+    of every file in the bundle like sha256sum does, paths relative to
+    the bundle root. Returns a dictionary of paths to digests.
+    """
+    manifest = {}
+    for line in data.decode('utf-8').splitlines():
+        if not line:
+            continue
+        try:
+            digest, path = line.split('  ', 1)
+        except ValueError:
+            raise MalformedBundleException('Invalid manifest line %r' % line)
+        manifest[path] = digest
+    return manifest
+
+
+def format_manifest(manifest):
+    """Format a dictionary of paths to digests as a manifest"""
+    return ''.join(['%s  %s\n' % (manifest[path], path)
+                    for path in sorted(manifest)]).encode('utf-8')
+
+
+def _remove_trees(paths):
+    for path in paths:
+        # rmtree() unlinks relative to directory descriptors where the
+        # platform allows it
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def move_to_trash(path):
+    """Remove a directory tree without waiting for it to be deleted.
+
+    The tree is renamed into a hidden trash directory next to it, which
+    is instant, and deleted by a background thread, along with the
+    trash an interrupted deletion left behind.
+    """
+    parent_dir = os.path.dirname(os.path.abspath(path))
+    trash_dirs = [os.path.join(parent_dir, name)
+                  for name in os.listdir(parent_dir)
+                  if name.startswith(_TRASH_PREFIX)]
+
+    trash_dir = tempfile.mkdtemp(dir=parent_dir, prefix=_TRASH_PREFIX)
+    try:
+        os.rename(path, os.path.join(trash_dir, os.path.basename(path)))
+    except OSError:
+        os.rmdir(trash_dir)
+        raise
+    trash_dirs.append(trash_dir)
+
+    threading.Thread(target=_remove_trees, args=(trash_dirs,)).start()
+
+
 class Bundle(object):
     """A Sugar activity, content module, etc.
 
@@ -65,11 +149,14 @@ class Bundle(object):
 
     _zipped_extension = None
     _unzipped_extension = None
+    _infodir = None
 
     def __init__(self, path):
         self._path = path
         self._zip_root_dir = None
         self._zip_file = None
+        self._zip_closed = False
+        self._zip_dirs = None
         self._installation_time = os.stat(path).st_mtime
 
         if not os.path.isdir(self._path):
@@ -84,6 +171,19 @@ class Bundle(object):
         if self._zip_file is not None:
             self._zip_file.close()
 
+    def close(self):
+        """Close the zip file of a zipped bundle. It is opened again
+        if members are read afterwards."""
+        if self._zip_file is not None and not self._zip_closed:
+            self._zip_file.close()
+            self._zip_closed = True
+
+    def _open_zip_file(self):
+        if self._zip_closed:
+            self._zip_file = zipfile.ZipFile(self._path)
+            self._zip_closed = False
+        return self._zip_file
+
     def _check_zip_bundle(self):
         file_names = self._zip_file.namelist()
         if len(file_names) == 0:
@@ -104,13 +204,28 @@ class Bundle(object):
                     'directory whose name ends with %r' %
                     self._unzipped_extension)
 
+        # Index the directories while checking the names, so is_dir()
+        # doesn't walk the list. is_file() uses the zip's own table of
+        # contents, so only directories are stored, and walking up a
+        # path stops at the first directory already indexed.
+        dirs = set()
         for file_name in file_names:
             if not file_name.startswith(self._zip_root_dir):
                 raise MalformedBundleException(
                     'All files in the bundle must be inside a single ' +
                     'top-level directory')
+            dir_name = os.path.dirname(file_name)
+            while dir_name and dir_name not in dirs:
+                dirs.add(dir_name)
+                dir_name = os.path.dirname(dir_name)
+        self._zip_dirs = frozenset(dirs)
 
     def get_file(self, filename):
+        """Open a file of the bundle for reading, in binary mode.
+
+        Members of zipped bundles are decompressed as they are read.
+        Returns None if there is no such file.
+        """
         f = None
 
         if self._zip_file is None:
@@ -123,14 +238,52 @@ class Bundle(object):
         else:
             path = os.path.join(self._zip_root_dir, filename)
             try:
-                data = self._zip_file.read(path)
-                f = six.BytesIO(data)
+                f = self._open_zip_file().open(path)
             except KeyError:
                 logging.debug('%s not found in zip %s.' % (filename, path))
                 return None
 
         return f
 
+    def get_file_data(self, filename):
+        """Get the contents of a file of the bundle as bytes, or None"""
+        f = self.get_file(filename)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def get_file_path(self, filename):
+        """Get a path to a file of the bundle, or None if there is no such
+        file. Members of zipped bundles are extracted once to a directory
+        removed at exit, and the same path is returned afterwards."""
+        global _extracted_dir
+
+        if self._zip_file is None:
+            path = os.path.join(self._path, filename)
+            if not os.path.isfile(path):
+                return None
+            return path
+
+        key = '%s:%s:%s' % (self._path, self._installation_time, filename)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest() + \
+            os.path.splitext(filename)[1]
+        if _extracted_dir is None:
+            _extracted_dir = tempfile.mkdtemp(prefix='bundle')
+            atexit.register(_remove_extracted_dir)
+        path = os.path.join(_extracted_dir, name)
+        if os.path.exists(path):
+            return path
+
+        f = self.get_file(filename)
+        if f is None:
+            return None
+        fd, temp_path = tempfile.mkstemp(dir=_extracted_dir)
+        with f, os.fdopen(fd, 'wb') as extracted:
+            shutil.copyfileobj(f, extracted)
+        os.rename(temp_path, path)
+        return path
+
     def is_file(self, filename):
         if self._zip_file is None:
             path = os.path.join(self._path, filename)
@@ -149,11 +302,8 @@ class Bundle(object):
             path = os.path.join(self._path, filename)
             return os.path.isdir(path)
         else:
-            path = os.path.join(self._zip_root_dir, filename, "")
-            for f in self._zip_file.namelist():
-                if f.startswith(path):
-                    return True
-            return False
+            path = os.path.join(self._zip_root_dir, filename)
+            return path.rstrip('/') in self._zip_dirs
 
     def get_path(self):
         """Get the bundle path."""
@@ -167,24 +317,205 @@ class Bundle(object):
     def get_show_launcher(self):
         return True
 
-    def _unzip(self, install_dir):
+    def _unzip(self, install_dir, progress_cb=None):
+        """Extract the bundle in install_dir, replacing the previous
+        version if there is one.
+
+        The members are extracted by a pool of threads into a temporary
+        directory next to the final one, which is then renamed into
+        place, so an interrupted install leaves no half-written bundle.
+        progress_cb, if given, is called with the number of bytes
+        extracted so far and the total.
+
+        When the bundle has a manifest, the files of the installed copy
+        whose content has the digest listed are hard linked into the new
+        version instead of being extracted. Unchanged files may then be
+        left out of the archive, as in the delta bundles made by
+        bundlebuilder. The installed files are hashed, so a modified
+        copy is replaced by the member of the archive.
+        """
         if self._zip_file is None:
             raise AlreadyInstalledException
 
         if not os.path.isdir(install_dir):
             os.mkdir(install_dir, 0o775)
 
-        # zipfile provides API that in theory would let us do this
-        # correctly by hand, but handling all the oddities of
-        # Windows/UNIX mappings, extension attributes, deprecated
-        # features, etc makes it impractical.
-        if subprocess.call(['unzip', '-o', self._path, '-x', 'mimetype',
-                            '-d', install_dir]):
-            # clean up install dir after failure
-            shutil.rmtree(os.path.join(install_dir, self._zip_root_dir),
-                          ignore_errors=True)
+        # temporary directories left behind by interrupted installs
+        temp_prefix = '.%s-' % self._zip_root_dir
+        for name in os.listdir(install_dir):
+            if name.startswith(temp_prefix):
+                move_to_trash(os.path.join(install_dir, name))
+
+        install_path = os.path.join(install_dir, self._zip_root_dir)
+        temp_dir = tempfile.mkdtemp(dir=install_dir, prefix=temp_prefix)
+        try:
+            manifest, reusable = self._get_reusable_files(install_path)
+            self._extract(temp_dir, progress_cb, manifest, reusable)
+
+            if os.path.lexists(install_path):
+                move_to_trash(install_path)
+            os.rename(os.path.join(temp_dir, self._zip_root_dir),
+                      install_path)
+        except Exception as e:
+            logging.error('Could not extract %s: %s', self._path, e)
             # indicate failure.
-            raise ZipExtractException
+            raise ZipExtractException(str(e))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _is_inside_root(self, dest_dir, path):
+        root_path = os.path.join(dest_dir, self._zip_root_dir)
+        return path == root_path or path.startswith(root_path + os.sep)
+
+    def _get_extract_path(self, dest_dir, name):
+        path = os.path.normpath(os.path.join(dest_dir, name))
+        if os.path.isabs(name) or not self._is_inside_root(dest_dir, path):
+            raise ZipExtractException('Invalid path %r' % name)
+        return path
+
+    def _get_reusable_files(self, install_path):
+        """Returns the manifest of the bundle, and the paths of the files
+        of the copy installed in install_path that have the digest
+        listed, by path relative to the bundle root"""
+        if self._infodir is None:
+            return {}, {}
+        manifest_name = os.path.join(self._infodir, MANIFEST_NAME)
+        data = self.get_file_data(manifest_name)
+        if data is None:
+            return {}, {}
+        manifest = parse_manifest(data)
+
+        if not os.path.isdir(install_path) or os.path.islink(install_path):
+            return manifest, {}
+
+        install_path = os.path.normpath(install_path)
+        reusable = {}
+        for name in manifest:
+            path = os.path.normpath(os.path.join(install_path, name))
+            if not path.startswith(install_path + os.sep):
+                continue
+            try:
+                if not stat.S_ISREG(os.lstat(path).st_mode):
+                    continue
+                # the installed copy may have been modified
+                if hash_file(path) == manifest[name]:
+                    reusable[name] = path
+            except (IOError, OSError):
+                pass
+        return manifest, reusable
+
+    def _extract(self, dest_dir, progress_cb, manifest=None, reusable=None):
+        manifest = manifest or {}
+        reusable = dict(reusable or {})
+        root_prefix = self._zip_root_dir + '/'
+
+        dirs = {}
+        files = []
+        links = []
+        names = set()
+        # modes of the members that are linked from the installed copy
+        reused_modes = {}
+        for info in self._open_zip_file().infolist():
+            if info.filename == 'mimetype':
+                continue
+            path = self._get_extract_path(dest_dir, info.filename)
+            mode = (info.external_attr >> 16) & 0o777
+            if info.filename.endswith('/'):
+                dirs[path] = mode or 0o755
+                continue
+
+            name = info.filename[len(root_prefix):]
+            names.add(name)
+            is_link = stat.S_ISLNK(info.external_attr >> 16)
+            if name in reusable and not is_link:
+                reused_modes[name] = mode or 0o644
+                continue
+            reusable.pop(name, None)
+
+            parent = os.path.dirname(path)
+            if parent not in dirs:
+                dirs[parent] = 0o755
+            if is_link:
+                links.append((info, path))
+            else:
+                files.append((info, path, mode or 0o644))
+
+        missing = [name for name in manifest
+                   if name not in names and name not in reusable]
+        if missing:
+            raise ZipExtractException(
+                '%d files are neither in the bundle nor installed, e.g. %r'
+                % (len(missing), missing[0]))
+
+        reused = []
+        for name, installed_path in reusable.items():
+            path = self._get_extract_path(dest_dir, root_prefix + name)
+            parent = os.path.dirname(path)
+            if parent not in dirs:
+                dirs[parent] = 0o755
+            reused.append((installed_path, path, reused_modes.get(name)))
+
+        for path in sorted(dirs):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+        for installed_path, path, mode in reused:
+            try:
+                os.link(installed_path, path)
+            except OSError:
+                shutil.copy2(installed_path, path)
+            if mode is not None:
+                os.chmod(path, mode)
+
+        total = sum([info.file_size for info, path, mode in files])
+        extracted = 0
+        # every worker reads from a ZipFile of its own
+        local = threading.local()
+        zip_files = []
+
+        def extract_file(info, path, mode):
+            zip_file = getattr(local, 'zip_file', None)
+            if zip_file is None:
+                zip_file = local.zip_file = zipfile.ZipFile(self._path)
+                zip_files.append(zip_file)
+            return self._extract_file(zip_file, info, path, mode)
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                    _EXTRACT_WORKERS) as pool:
+                futures = [pool.submit(extract_file, info, path, mode)
+                           for info, path, mode in files]
+                for future in concurrent.futures.as_completed(futures):
+                    extracted += future.result()
+                    if progress_cb is not None:
+                        progress_cb(extracted, total)
+        finally:
+            for zip_file in zip_files:
+                zip_file.close()
+
+        # Symbolic links last, so no member is written through one, and
+        # only to targets inside the bundle.
+        for info, path in links:
+            target = self._open_zip_file().read(info).decode('utf-8')
+            target_path = os.path.normpath(
+                os.path.join(os.path.dirname(path), target))
+            if os.path.isabs(target) or \
+                    not self._is_inside_root(dest_dir, target_path):
+                raise ZipExtractException('Invalid link %r to %r' %
+                                          (info.filename, target))
+            os.symlink(target, path)
+
+        # deepest first, in case a directory is not writable
+        for path in sorted(dirs, reverse=True):
+            os.chmod(path, dirs[path])
+
+    def _extract_file(self, zip_file, info, path, mode):
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW
+        with zip_file.open(info) as source:
+            with os.fdopen(os.open(path, flags, mode), 'wb') as dest:
+                shutil.copyfileobj(source, dest, _EXTRACT_BUFFER_SIZE)
+            os.chmod(path, mode)
+        return info.file_size
 
     def _zip(self, bundle_path):
         if self._zip_file is not None:
@@ -200,13 +531,4 @@ class Bundle(object):
             if ext != self._unzipped_extension:
                 raise InvalidPathException
 
-        for root, dirs, files in os.walk(install_path, topdown=False):
-            for name in files:
-                os.remove(os.path.join(root, name))
-            for name in dirs:
-                path = os.path.join(root, name)
-                if os.path.islink(path):
-                    os.remove(path)
-                else:
-                    os.rmdir(path)
-        os.rmdir(install_path)
+        move_to_trash(install_path)
@@ -0,0 +1,250 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""Persistent index of the parsed metadata of installed bundles
+
+UNSTABLE. ActivityBundle looks up the metadata of installed bundles
+here before parsing their activity.info and activity.linfo files.
+Entries are keyed by the bundle path and only used while the
+modification times of the files they were parsed from are unchanged.
+Bundles outside of the activity install directories, like source
+checkouts, are not indexed.
+
+Each bundle has its own small JSON file in the profile, so a process
+only reads the entries of the bundles it uses, and processes writing
+entries concurrently don't overwrite each other's. Changed entries are
+written back, each replacing its file atomically, when the main loop
+is idle, or at exit. prune() drops the entries of bundles that were
+removed.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from sugar3 import env
+
+_INDEX_DIR = 'bundle-index'
+_INDEX_VERSION = 2
+
+# bundle path -> {'info_mtime': ..., 'info': {...},
+#                 'linfo': {linfo path -> {'mtime': ..., 'strings': {...}}}}
+# or None if the bundle is not indexed
+_entries = {}
+# bundle paths whose entry changed since it was loaded
+_dirty = set()
+_save_sid = None
+
+
+def _get_index_dir():
+    return env.get_profile_path(_INDEX_DIR)
+
+
+def _get_entry_path(bundle_path):
+    name = hashlib.sha1(os.fsencode(bundle_path)).hexdigest()
+    return os.path.join(_get_index_dir(), name + '.json')
+
+
+def _get_install_dirs():
+    dirs = [env.get_user_activities_path()]
+    data_dirs = os.environ.get('XDG_DATA_DIRS', '/usr/local/share:/usr/share')
+    for data_dir in data_dirs.split(':'):
+        if data_dir:
+            dirs.append(os.path.join(data_dir, 'sugar', 'activities'))
+    return set([os.path.normpath(path) for path in dirs])
+
+
+def _is_installed(bundle_path, install_dirs=None):
+    if install_dirs is None:
+        install_dirs = _get_install_dirs()
+    return os.path.dirname(os.path.normpath(bundle_path)) in install_dirs
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_entry_file(entry_path):
+    """Returns the bundle path and entry stored in entry_path"""
+    try:
+        with open(entry_path) as f:
+            data = json.load(f)
+    except (IOError, OSError):
+        return None, None
+    except ValueError as e:
+        logging.warning('Ignoring invalid bundle index entry %s: %s',
+                        entry_path, e)
+        return None, None
+
+    if not isinstance(data, dict) or data.get('version') != _INDEX_VERSION:
+        return None, None
+    return data.get('path'), data.get('entry')
+
+
+def _load(bundle_path):
+    if bundle_path not in _entries:
+        path, entry = _read_entry_file(_get_entry_path(bundle_path))
+        # a hash collision, however unlikely, is just a miss
+        _entries[bundle_path] = entry if path == bundle_path else None
+    return _entries[bundle_path]
+
+
+def _write_entry(bundle_path, entry):
+    entry_path = _get_entry_path(bundle_path)
+    if entry is None or not os.path.isdir(bundle_path):
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+        return
+
+    index_dir = os.path.dirname(entry_path)
+    try:
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+        fd, temp_path = tempfile.mkstemp(dir=index_dir, prefix='.entry')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': _INDEX_VERSION, 'path': bundle_path,
+                       'entry': entry}, f, separators=(',', ':'))
+        os.rename(temp_path, entry_path)
+    except (IOError, OSError) as e:
+        logging.warning('Could not write the bundle index entry of %s: %s',
+                        bundle_path, e)
+
+
+def save():
+    """Write the entries that changed since they were loaded to disk"""
+    global _save_sid
+
+    if _save_sid is not None:
+        from gi.repository import GLib
+        GLib.source_remove(_save_sid)
+        _save_sid = None
+
+    while _dirty:
+        bundle_path = _dirty.pop()
+        _write_entry(bundle_path, _entries.get(bundle_path))
+
+
+def prune():
+    """Drop the entries of the bundles that are no longer installed"""
+    save()
+    index_dir = _get_index_dir()
+    try:
+        names = os.listdir(index_dir)
+    except OSError:
+        return
+
+    install_dirs = _get_install_dirs()
+    for name in names:
+        entry_path = os.path.join(index_dir, name)
+        if name.startswith('.'):
+            # a temporary file left by a process that was killed
+            # while writing, or still writing
+            continue
+        bundle_path, entry = _read_entry_file(entry_path)
+        if bundle_path is not None and \
+                _is_installed(bundle_path, install_dirs) and \
+                os.path.isdir(bundle_path):
+            continue
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+        if bundle_path is not None:
+            _entries.pop(bundle_path, None)
+
+
+def _save_cb():
+    global _save_sid
+
+    _save_sid = None
+    save()
+    return False
+
+
+def _changed(bundle_path):
+    global _save_sid
+
+    _dirty.add(bundle_path)
+
+    if _save_sid is None:
+        try:
+            from gi.repository import GLib
+        except ImportError:
+            return
+        _save_sid = GLib.idle_add(_save_cb)
+
+
+atexit.register(save)
+
+
+def get_info(bundle_path, info_path):
+    """Return the metadata parsed from info_path, a file of the bundle,
+    or None if it is not indexed or was modified since"""
+    entry = _load(bundle_path)
+    if entry is None or entry['info_mtime'] != _get_mtime(info_path):
+        return None
+    return entry['info']
+
+
+def set_info(bundle_path, info_path, info):
+    """Index the metadata parsed from info_path, forgetting the
+    translations indexed for the previous version of the bundle"""
+    if not _is_installed(bundle_path):
+        return
+    mtime = _get_mtime(info_path)
+    if mtime is None:
+        return
+    _entries[bundle_path] = {'info_mtime': mtime, 'info': info,
+                             'linfo': {}}
+    _changed(bundle_path)
+
+
+def get_translations(bundle_path, linfo_path):
+    """Return the translated strings parsed from linfo_path, or None if
+    they are not indexed or the file was modified since"""
+    entry = _load(bundle_path)
+    if entry is None:
+        return None
+    linfo = entry['linfo'].get(linfo_path)
+    if linfo is None or linfo['mtime'] != _get_mtime(linfo_path):
+        return None
+    return linfo['strings']
+
+
+def set_translations(bundle_path, linfo_path, strings):
+    """Index the translated strings parsed from linfo_path; the metadata
+    of the bundle must be indexed already"""
+    entry = _load(bundle_path)
+    mtime = _get_mtime(linfo_path)
+    if entry is None or mtime is None:
+        return
+    entry['linfo'][linfo_path] = {'mtime': mtime, 'strings': strings}
+    _changed(bundle_path)
+
+
+def remove(bundle_path):
+    """Forget a bundle, e.g. when it is uninstalled"""
+    _entries[bundle_path] = None
+    _changed(bundle_path)
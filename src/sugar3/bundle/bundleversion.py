@@ -31,6 +31,10 @@ Instances of :class:`NormalizedVersion` can be directly compared;
 
 Invalid versions will raise :exc:`InvalidVersionError`.
 
+:func:`sort_key` gives the same ordering as a plain tuple, to sort many
+versions, and :func:`find_updates` compares installed bundles with a
+catalog of available versions in one pass.
+
 Valid versions are `1`, `1.2`, `1.2.3`, `1.2.3-peru`, and
 `1.2.3~dfsg`.
 
@@ -48,6 +52,8 @@ Attributes:
 """
 
 import re
+import logging
+from functools import lru_cache
 
 
 VERSION_RE = re.compile(r'''
@@ -70,84 +76,73 @@ class InvalidVersionError(Exception):
     pass
 
 
-class NormalizedVersion(object):
-    """
-    Normalize a version string.
-
-    Args:
-        activity_version (str): the version string
-
-    Raises:
-        :exc:`InvalidVersionError`
-
-    Attributes:
-        parts (list): the numeric parts of the version after normalization.
-    """
-
-    def __init__(self, activity_version):
-        self._activity_version = activity_version
-        self.parts = []
-        self._local = None
-
-        if not isinstance(self._activity_version, str):
-            raise InvalidVersionError(self._activity_version)
+def _parse_segment(segment, activity_version):
+    if len(segment) > 1 and segment[0] == '0':
+        raise InvalidVersionError("Can not have leading zero in segment"
+                                  " %s in %r" % (segment, activity_version))
+    return int(segment)
 
-        match = VERSION_RE.search(self._activity_version)
-        if not match:
-            raise InvalidVersionError(self._activity_version)
 
-        groups = match.groupdict()
+@lru_cache(maxsize=1024)
+def _parse(activity_version):
+    """Parse a version string into its numeric parts, without trailing
+    zeros, and its local suffix. Memoized, as the same versions are
+    parsed over and over when checking for updates."""
+    match = VERSION_RE.search(activity_version)
+    if not match:
+        raise InvalidVersionError(activity_version)
 
-        version = self._parse_version(groups['version'])
-        self.parts.append(version)
+    groups = match.groupdict()
 
-        if groups['extraversion'] not in ('', None):
-            versions = self._parse_extraversions(groups['extraversion'][1:])
-            self.parts.extend(versions)
+    parts = [_parse_segment(groups['version'], activity_version)]
+    if groups['extraversion'] not in ('', None):
+        extraversions = [_parse_segment(n, activity_version)
+                         for n in groups['extraversion'][1:].split('.')]
+        while extraversions and extraversions[-1] == 0:
+            extraversions.pop()
+        parts.extend(extraversions)
 
-        self._local = groups['local']
+    return tuple(parts), groups['local']
 
-    def _parse_version(self, version_string):
-        """Verify that there is no leading zero and convert to integer.
 
-        Keyword arguments:
-        version -- string to be parsed
+def sort_key(activity_version):
+    """Get a key ordering version strings like NormalizedVersion does,
+    e.g. for sorted(versions, key=sort_key).
 
-        Return: Version
+    Raises:
+        :exc:`InvalidVersionError`
+    """
+    if not isinstance(activity_version, str):
+        raise InvalidVersionError(activity_version)
+    return _parse(activity_version)[0]
 
-        """
-        if len(version_string) > 1 and version_string[0] == '0':
-            raise InvalidVersionError("Can not have leading zero in segment"
-                                      " %s in %r" %
-                                      (version_string, self._activity_version))
 
-        return int(version_string)
+class NormalizedVersion(object):
+    """
+    Normalize a version string.
 
-    def _parse_extraversions(self, extraversion_string):
-        """Split into N versions and convert them to integers, verify
-        that there are no leading zeros and drop trailing zeros.
+    Args:
+        activity_version (str): the version string
 
-        Keyword arguments:
-        extraversion -- 'N.N.N...' sequence to be parsed
+    Raises:
+        :exc:`InvalidVersionError`
 
-        Return: List of extra versions
+    Attributes:
+        parts (list): the numeric parts of the version after normalization.
+    """
 
-        """
-        nums = []
-        for n in extraversion_string.split("."):
-            if len(n) > 1 and n[0] == '0':
-                raise InvalidVersionError("Can not have leading zero in "
-                                          "segment %s in %r"
-                                          % (n, self._activity_version))
-            nums.append(int(n))
+    __slots__ = ('_activity_version', '_key', '_local', 'parts')
 
-        while nums and nums[-1] == 0:
-            nums.pop()
+    def __init__(self, activity_version):
+        if not isinstance(activity_version, str):
+            raise InvalidVersionError(activity_version)
 
-        return nums
+        self._activity_version = activity_version
+        self._key, self._local = _parse(activity_version)
+        self.parts = list(self._key)
 
     def __str__(self):
-        version_string = '.'.join(str(v) for v in self.parts)
+        version_string = '.'.join(str(v) for v in self._key)
         if self._local is not None:
             version_string += self._local
         return version_string
@@ -155,6 +150,9 @@ class NormalizedVersion(object):
     def __repr__(self):
         return "%s('%s')" % (self.__class__.__name__, self)
 
+    def __hash__(self):
+        return hash(self._key)
+
     def _cannot_compare(self, other):
         raise TypeError("Can not compare %s and %s"
                         % (type(self).__name__, type(other).__name__))
@@ -162,21 +160,70 @@ class NormalizedVersion(object):
     def __eq__(self, other):
         if not isinstance(other, NormalizedVersion):
             self._cannot_compare(other)
-        return self.parts == other.parts
+        return self._key == other._key
 
-    def __lt__(self, other):
+    def __ne__(self, other):
         if not isinstance(other, NormalizedVersion):
             self._cannot_compare(other)
-        return self.parts < other.parts
+        return self._key != other._key
 
-    def __ne__(self, other):
-        return not self.__eq__(other)
+    def __lt__(self, other):
+        if not isinstance(other, NormalizedVersion):
+            self._cannot_compare(other)
+        return self._key < other._key
 
     def __gt__(self, other):
-        return not (self.__lt__(other) or self.__eq__(other))
+        if not isinstance(other, NormalizedVersion):
+            self._cannot_compare(other)
+        return self._key > other._key
 
     def __le__(self, other):
-        return self.__eq__(other) or self.__lt__(other)
+        if not isinstance(other, NormalizedVersion):
+            self._cannot_compare(other)
+        return self._key <= other._key
 
     def __ge__(self, other):
-        return self.__eq__(other) or self.__gt__(other)
+        if not isinstance(other, NormalizedVersion):
+            self._cannot_compare(other)
+        return self._key >= other._key
+
+
+def find_updates(bundles, catalog):
+    """Find the bundles for which the catalog has a newer version.
+
+    Args:
+        bundles: the installed bundles, objects with get_bundle_id() and
+            get_activity_version() methods like
+            :class:`sugar3.bundle.activitybundle.ActivityBundle`
+        catalog: iterable of (bundle_id, version, data) tuples for the
+            available versions, data being anything the caller needs
+            to fetch them, e.g. a URL
+
+    Returns:
+        a list of (bundle, version, data) tuples with the newest
+        available version of each bundle that has an update, in the
+        order of bundles. Versions that can't be parsed are skipped.
+    """
+    newest = {}
+    for bundle_id, version, data in catalog:
+        try:
+            key = sort_key(version)
+        except InvalidVersionError:
+            logging.warning('Invalid version %r of %s in the catalog',
+                            version, bundle_id)
+            continue
+        if bundle_id not in newest or key > newest[bundle_id][0]:
+            newest[bundle_id] = (key, version, data)
+
+    updates = []
+    for bundle in bundles:
+        available = newest.get(bundle.get_bundle_id())
+        if available is None:
+            continue
+        try:
+            key = sort_key(bundle.get_activity_version())
+        except InvalidVersionError:
+            continue
+        if available[0] > key:
+            updates.append((bundle, available[1], available[2]))
+    return updates
@@ -24,7 +24,6 @@ UNSTABLE.
 from six.moves import urllib
 from six.moves.configparser import ConfigParser
 
-import tempfile
 import os
 
 from sugar3 import env
@@ -59,9 +58,10 @@ class ContentBundle(Bundle):
         info_file = self.get_file('library/library.info')
         if info_file is None:
             raise MalformedBundleException('No library.info file')
-        self._parse_info(info_file)
+        with info_file:
+            self._parse_info(info_file)
 
-        if self.get_file(self._activity_start) is None:
+        if not self.is_file(self._activity_start):
             raise MalformedBundleException(
                 'Content bundle %s does not have start page %s' %
                 (self._path, self._activity_start))
@@ -121,25 +121,26 @@ class ContentBundle(Bundle):
     def get_activity_start(self):
         return self._activity_start
 
+    def _get_icon_path(self):
+        icon_path = os.path.join('library', self._icon)
+        if os.path.splitext(icon_path)[1] == '':
+            icon_path += '.svg'
+        return icon_path
+
     def get_icon(self):
         if not self._icon:
             return None
 
-        icon_path = os.path.join('library', self._icon)
-        ext = os.path.splitext(icon_path)[1]
-        if ext == '':
-            ext = '.svg'
-            icon_path += ext
-
+        icon_path = self._get_icon_path()
         if self._zip_file is None:
             return os.path.join(self._path, icon_path)
         else:
-            icon_data = self.get_file(icon_path).read()
-            temp_file, temp_file_path = tempfile.mkstemp(prefix=self._icon,
-                                                         suffix=ext)
-            os.write(temp_file, icon_data)
-            os.close(temp_file)
-            return temp_file_path
+            return self.get_file_path(icon_path)
+
+    def get_icon_data(self):
+        if not self._icon:
+            return None
+        return self.get_file_data(self._get_icon_path())
 
     def get_start_uri(self):
         path = os.path.join(self.get_path(), self._activity_start)
@@ -154,9 +155,9 @@ class ContentBundle(Bundle):
     def get_tags(self):
         return None
 
-    def install(self):
+    def install(self, progress_cb=None):
         install_path = env.get_user_library_path()
-        self._unzip(install_path)
+        self._unzip(install_path, progress_cb)
         return os.path.join(install_path, self._zip_root_dir)
 
     def uninstall(self, force=False, delete_profile=False):
@@ -23,9 +23,15 @@ STABLE
 import six
 import logging
 import time
+import collections
+import weakref
+from functools import partial
 from datetime import datetime
 import os
+import fcntl
+import shutil
 import tempfile
+from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gio
 import dbus
@@ -41,6 +47,62 @@ DS_DBUS_PATH = '/org/laptop/sugar/DataStore'
 
 _data_store = None
 
+_METADATA_CACHE_SIZE = 256
+
+
+class _MetadataCache(object):
+    """Bounded cache of the properties of DS entries
+
+    The datastore signals keep it up to date, entries are evicted in
+    least recently used order.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._entries = collections.OrderedDict()
+
+    def get(self, object_id):
+        properties = self._entries.pop(object_id, None)
+        if properties is None:
+            return None
+        self._entries[object_id] = properties
+        return properties.copy()
+
+    def set(self, object_id, properties):
+        self._entries.pop(object_id, None)
+        self._entries[object_id] = dict(properties)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    def remove(self, object_id):
+        self._entries.pop(object_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+_metadata_cache = _MetadataCache(_METADATA_CACHE_SIZE)
+
+# Live DSObjects by object id. The Updated signal is dispatched to them
+# from a single subscription instead of a D-Bus match rule per object.
+_ds_objects = {}
+
+
+def _register_ds_object(object_id, ds_object):
+    _get_data_store()
+    if object_id not in _ds_objects:
+        _ds_objects[object_id] = weakref.WeakSet()
+    _ds_objects[object_id].add(ds_object)
+
+
+def _unregister_ds_object(object_id, ds_object):
+    ds_objects = _ds_objects.get(object_id)
+    if ds_objects is None:
+        return
+    ds_objects.discard(ds_object)
+    if not ds_objects:
+        del _ds_objects[object_id]
+
 
 def _get_data_store():
     global _data_store
@@ -57,17 +119,89 @@ def _get_data_store():
     return _data_store
 
 
+def _call_async(method, signature, args, reply_handler, error_handler,
+                **kwargs):
+    """Call a method of the datastore asynchronously
+
+    Returns the dbus PendingCall. Its block() waits for this reply and
+    calls the handler, without dispatching anything else, so callers
+    that look synchronous don't run the main loop and re-enter theirs.
+    """
+    _get_data_store()
+    return dbus.SessionBus().call_async(
+        DS_DBUS_SERVICE, DS_DBUS_PATH, DS_DBUS_INTERFACE, method,
+        signature, args, reply_handler, error_handler, **kwargs)
+
+
+# Created and Updated signals received within this many milliseconds
+# are handled together, with a single fetch of the properties per entry.
+_SIGNALS_COALESCE_DELAY = 100
+
+# object id -> set of 'created'/'updated' signals waiting to be handled
+_pending_signals = {}
+_pending_signals_sid = None
+
+
+def _queue_signal(object_id, kind):
+    global _pending_signals_sid
+
+    _pending_signals.setdefault(object_id, set()).add(kind)
+    if _pending_signals_sid is None:
+        _pending_signals_sid = GLib.timeout_add(_SIGNALS_COALESCE_DELAY,
+                                                _flush_signals_cb)
+
+
+def _flush_signals_cb():
+    global _pending_signals, _pending_signals_sid
+
+    pending_signals = _pending_signals
+    _pending_signals = {}
+    _pending_signals_sid = None
+
+    for object_id, kinds in pending_signals.items():
+        _get_data_store().get_properties(
+            object_id, byte_arrays=True,
+            reply_handler=partial(_dispatch_signals, object_id, kinds),
+            error_handler=partial(_dispatch_signals_error_cb, object_id))
+    return False
+
+
+def _dispatch_signals(object_id, kinds, metadata):
+    _metadata_cache.set(object_id, metadata)
+
+    ds_objects = _ds_objects.get(object_id)
+    if ds_objects:
+        for ds_object in list(ds_objects):
+            ds_object._object_updated(metadata)
+    elif object_id in _ds_objects:
+        del _ds_objects[object_id]
+
+    if 'created' in kinds:
+        created.send(None, object_id=object_id, metadata=metadata)
+    elif 'updated' in kinds:
+        updated.send(None, object_id=object_id, metadata=metadata)
+
+
+def _dispatch_signals_error_cb(object_id, error):
+    # most likely deleted in the meantime, Deleted will follow
+    logging.debug('Could not get the properties of %s: %s', object_id, error)
+
+
 def __datastore_created_cb(object_id):
-    metadata = _get_data_store().get_properties(object_id, byte_arrays=True)
-    created.send(None, object_id=object_id, metadata=metadata)
+    _metadata_cache.remove(object_id)
+    if created.has_listeners():
+        _queue_signal(object_id, 'created')
 
 
 def __datastore_updated_cb(object_id):
-    metadata = _get_data_store().get_properties(object_id, byte_arrays=True)
-    updated.send(None, object_id=object_id, metadata=metadata)
+    _metadata_cache.remove(object_id)
+    if updated.has_listeners() or _ds_objects.get(object_id):
+        _queue_signal(object_id, 'updated')
 
 
 def __datastore_deleted_cb(object_id):
+    _metadata_cache.remove(object_id)
+    _pending_signals.pop(object_id, None)
     deleted.send(None, object_id=object_id)
 
 
@@ -76,6 +210,14 @@ deleted = dispatch.Signal()
 updated = dispatch.Signal()
 
 
+def _decode_value(value):
+    # dbus.ByteArray values are text, except binary ones like 'preview'
+    try:
+        return value.decode()
+    except UnicodeDecodeError:
+        return value
+
+
 class DSMetadata(GObject.GObject):
     """A representation of the metadata associated with a DS entry."""
     __gsignals__ = {
@@ -89,10 +231,8 @@ class DSMetadata(GObject.GObject):
         else:
             if six.PY3:
                 for x, y in list(properties.items()):
-                    try:
-                        properties[x] = y.decode()
-                    except BaseException:
-                        pass
+                    if isinstance(y, (bytes, bytearray)):
+                        properties[x] = _decode_value(y)
             self._properties = properties
 
         default_keys = ['activity', 'activity_id',
@@ -105,14 +245,16 @@ class DSMetadata(GObject.GObject):
         return self._properties[key]
 
     def __setitem__(self, key, value):
-        if six.PY3:
-            try:
-                value = value.decode()
-            except BaseException:
-                pass
+        if self._set(key, value):
+            self.emit('updated')
+
+    def _set(self, key, value):
+        if six.PY3 and isinstance(value, (bytes, bytearray)):
+            value = _decode_value(value)
         if key not in self._properties or self._properties[key] != value:
             self._properties[key] = value
-            self.emit('updated')
+            return True
+        return False
 
     def __delitem__(self, key):
         del self._properties[key]
@@ -140,45 +282,84 @@ class DSMetadata(GObject.GObject):
             return default
 
     def update(self, properties):
-        """Update all of the metadata"""
+        """Update all of the metadata, emitting 'updated' once"""
+        changed = False
         for (key, value) in list(properties.items()):
-            self[key] = value
+            if self._set(key, value):
+                changed = True
+        if changed:
+            self.emit('updated')
 
 
 class DSObject(object):
     """A representation of a DS entry."""
 
     def __init__(self, object_id, metadata=None, file_path=None):
-        self._update_signal_match = None
         self._object_id = None
 
         self.set_object_id(object_id)
 
         self._metadata = metadata
+        self._properties = None
+        self._pending_create = None
         self._file_path = file_path
         self._destroyed = False
         self._owns_file = False
 
+    @classmethod
+    def _from_properties(cls, object_id, properties):
+        # The DSMetadata is only built when the metadata is accessed,
+        # sparing it for the results of large queries
+        ds_object = cls(object_id)
+        ds_object._properties = properties
+        return ds_object
+
     def get_object_id(self):
         return self._object_id
 
+    def wait_for_create(self):
+        """Wait for the asynchronous create of this object started by
+        write(), if any, and return the object id (None if it failed)"""
+        if self._pending_create is not None:
+            self._pending_create.wait()
+        return self.object_id
+
     def set_object_id(self, object_id):
-        if self._update_signal_match is not None:
-            self._update_signal_match.remove()
+        self._pending_create = None
+        if self._object_id is not None:
+            _unregister_ds_object(self._object_id, self)
         if object_id is not None:
-            self._update_signal_match = _get_data_store().connect_to_signal(
-                'Updated', self.__object_updated_cb, arg0=object_id)
+            _register_ds_object(object_id, self)
 
         self._object_id = object_id
 
     object_id = property(get_object_id, set_object_id)
 
-    def __object_updated_cb(self, object_id):
-        properties = _get_data_store().get_properties(self._object_id,
-                                                      byte_arrays=True)
-        self._metadata.update(properties)
+    def _object_updated(self, properties):
+        if self._metadata is not None:
+            self._metadata.update(dict(properties))
+        elif self._properties is not None:
+            self._properties = dict(properties)
+
+    def get_preview(self):
+        """Get the preview, fetching it from the DS if the metadata was
+        retrieved without it"""
+        metadata = self.metadata
+        if metadata is not None and 'preview' in metadata:
+            return metadata['preview']
+        if self.object_id is None:
+            return None
+
+        preview = get_preview(self.object_id)
+        if preview is not None and metadata is not None:
+            # not a change of the entry, don't emit 'updated'
+            metadata.get_dictionary()['preview'] = preview
+        return preview
 
     def get_metadata(self):
+        if self._metadata is None and self._properties is not None:
+            self._metadata = DSMetadata(self._properties)
+            self._properties = None
         if self._metadata is None and self.object_id is not None:
             properties = _get_data_store().get_properties(self.object_id)
             metadata = DSMetadata(properties)
@@ -188,6 +369,7 @@ class DSObject(object):
     def set_metadata(self, metadata):
         if self._metadata != metadata:
             self._metadata = metadata
+            self._properties = None
 
     metadata = property(get_metadata, set_metadata)
 
@@ -212,6 +394,8 @@ class DSObject(object):
             logging.warning('This DSObject has already been destroyed!.')
             return
         self._destroyed = True
+        if self._object_id is not None:
+            _unregister_ds_object(self._object_id, self)
         if self._file_path and self._owns_file:
             if os.path.isfile(self._file_path):
                 os.remove(self._file_path)
@@ -225,7 +409,7 @@ class DSObject(object):
             self.destroy()
 
     def copy(self):
-        return DSObject(None, self._metadata.copy(), self._file_path)
+        return DSObject(None, self.metadata.copy(), self._file_path)
 
 
 class RawObject(object):
@@ -290,27 +474,171 @@ class RawObject(object):
             self.destroy()
 
 
-def get(object_id):
+def get(object_id, reply_handler=None, error_handler=None):
     """Get the properties of the object with the ID given.
 
     Keyword arguments:
     object_id -- unique identifier of the object
+    reply_handler -- will be called with the DSObject as argument; the
+                     properties are then fetched asynchronously
+                     (default None)
+    error_handler -- will be called with an instance of a DBusException
+                     representing a remote exception (default None)
 
-    Return: a DSObject
+    Return: a DSObject, or if called asynchronously the dbus PendingCall
+    to block() on, None when the reply handler was already called
 
     """
     logging.debug('datastore.get')
 
     if object_id.startswith('/'):
+        if reply_handler and error_handler:
+            reply_handler(RawObject(object_id))
+            return
         return RawObject(object_id)
 
-    metadata = _get_data_store().get_properties(object_id, byte_arrays=True)
+    data_store = _get_data_store()
+    metadata = _metadata_cache.get(object_id)
+
+    if reply_handler and error_handler:
+        if metadata is not None:
+            reply_handler(DSObject(object_id, DSMetadata(metadata), None))
+            return
+
+        def get_properties_reply_cb(metadata):
+            _metadata_cache.set(object_id, metadata)
+            reply_handler(DSObject(object_id, DSMetadata(metadata), None))
+
+        return _call_async('get_properties', 's', (object_id,),
+                           get_properties_reply_cb, error_handler,
+                           byte_arrays=True)
+
+    if metadata is None:
+        metadata = data_store.get_properties(object_id, byte_arrays=True)
+        _metadata_cache.set(object_id, metadata)
 
     ds_object = DSObject(object_id, DSMetadata(metadata), None)
-    # TODO: register the object for updates
     return ds_object
 
 
+def get_preview(object_id):
+    """Get the preview of the object with the ID given.
+
+    Combined with find() or get_many() requests leaving 'preview' out of
+    the properties, only the previews actually shown are transferred.
+
+    Keyword arguments:
+    object_id -- unique identifier of the object
+
+    Return: the PNG data of the preview, or None if there is none
+
+    """
+    metadata = _metadata_cache.get(object_id)
+    if metadata is not None:
+        return metadata.get('preview')
+
+    entries, total_count = _get_data_store().find(
+        {'uid': object_id, 'limit': 1}, ['uid', 'preview'], byte_arrays=True)
+    if not entries:
+        return None
+    return entries[0].get('preview')
+
+
+_GET_MANY_BATCH_SIZE = 100
+
+
+def get_many(object_ids, properties=None, reply_handler=None,
+             error_handler=None):
+    """Get the DSObjects for several object IDs at once.
+
+    The entries are requested in batches of find() calls, all issued
+    before waiting for any reply, instead of one blocking get_properties
+    call per entry.
+
+    Keyword arguments:
+    object_ids -- list of unique identifiers of the objects
+    properties -- list of the metadata you want to be present, e.g.
+                  ['title', 'keep'], so large ones like 'preview' are not
+                  transferred (default None, all of them)
+    reply_handler -- will be called with the list of DSObjects as argument
+                     (default None)
+    error_handler -- will be called with an instance of a DBusException
+                     representing a remote exception (default None)
+
+    Return: a list of DSObjects in the order of object_ids, leaving out the
+            entries that don't exist and repeated IDs; None if called
+            asynchronously
+
+    """
+    logging.debug('datastore.get_many')
+
+    if properties:
+        properties = list(properties)
+        if 'uid' not in properties:
+            properties.append('uid')
+
+    results = {}
+    pending_ids = []
+    unique_ids = []
+    seen = set()
+    for object_id in object_ids:
+        if object_id in seen:
+            continue
+        seen.add(object_id)
+        unique_ids.append(object_id)
+        if object_id.startswith('/'):
+            results[object_id] = RawObject(object_id)
+            continue
+        if not properties:
+            metadata = _metadata_cache.get(object_id)
+            if metadata is not None:
+                results[object_id] = DSObject._from_properties(object_id,
+                                                               metadata)
+                continue
+        pending_ids.append(object_id)
+
+    batches = [pending_ids[i:i + _GET_MANY_BATCH_SIZE]
+               for i in range(0, len(pending_ids), _GET_MANY_BATCH_SIZE)]
+    state = {'pending': len(batches), 'error': None}
+    is_async = bool(reply_handler and error_handler)
+
+    def get_results():
+        return [results[object_id] for object_id in unique_ids
+                if object_id in results]
+
+    def find_reply_cb(entries, total_count):
+        for entry in entries:
+            object_id = entry['uid']
+            del entry['uid']
+            results[object_id] = DSObject._from_properties(object_id, entry)
+        state['pending'] -= 1
+        if is_async and state['pending'] == 0 and state['error'] is None:
+            reply_handler(get_results())
+
+    def find_error_cb(error):
+        if state['error'] is not None:
+            return
+        state['error'] = error
+        if is_async:
+            error_handler(error)
+
+    calls = [_find_async({'uid': batch}, limit=len(batch),
+                         properties=properties, reply_handler=find_reply_cb,
+                         error_handler=find_error_cb)
+             for batch in batches]
+
+    if is_async:
+        if not batches:
+            reply_handler(get_results())
+        return
+
+    for call in calls:
+        call.block()
+        if state['error'] is not None:
+            raise state['error']
+    return get_results()
+
+
 def create():
     """Create a new DSObject.
 
@@ -330,6 +658,8 @@ def _update_ds_entry(uid, properties, filename, transfer_ownership=False,
         debug_properties['preview'] = '<omitted>'
     logging.debug('dbus_helpers.update: %s, %s, %s, %s', uid, filename,
                   debug_properties, transfer_ownership)
+    # the Updated signal will bring the new properties
+    _metadata_cache.remove(uid)
     if reply_handler and error_handler:
         _get_data_store().update(uid, dbus.Dictionary(properties), filename,
                                  transfer_ownership,
@@ -347,6 +677,109 @@ def _create_ds_entry(properties, filename, transfer_ownership=False):
     return object_id
 
 
+def _release_file(filename, transfer_ownership, keep=None):
+    # remove a file passed to us with transfer_ownership that won't
+    # reach the datastore
+    if transfer_ownership and filename and filename != keep and \
+            os.path.isfile(filename):
+        os.remove(filename)
+
+
+class _PendingCreate(object):
+    """A create call waiting for its reply, and the writes of the same
+    DSObject issued meanwhile"""
+
+    def __init__(self, filename, transfer_ownership):
+        self.done = False
+        self.error = None
+        self.object_id = None
+        self.call = None
+        self._filename = filename
+        self._transfer_ownership = transfer_ownership
+        self._queued_write = None
+        self._handlers = []
+
+    def queue_write(self, properties, filename, transfer_ownership,
+                    reply_handler, error_handler, timeout):
+        # only the last write is sent, release the file of the one it
+        # replaces if it was passed to us
+        if self._queued_write is not None:
+            old_filename, old_transfer = self._queued_write[1:3]
+            _release_file(old_filename, old_transfer, keep=filename)
+
+        self._queued_write = (properties, filename, transfer_ownership,
+                              timeout)
+        self._handlers.append((reply_handler, error_handler))
+
+    def wait(self):
+        if not self.done:
+            self.call.block()
+
+    def created(self, object_id):
+        self.done = True
+        self.object_id = object_id
+        if self._queued_write is None:
+            return
+
+        properties, filename, transfer_ownership, timeout = \
+            self._queued_write
+        properties['uid'] = object_id
+        _update_ds_entry(object_id, properties, filename, transfer_ownership,
+                         reply_handler=self.__update_reply_cb,
+                         error_handler=self.__update_error_cb,
+                         timeout=timeout)
+        self._queued_write = None
+
+    def failed(self, error):
+        self.done = True
+        self.error = error
+
+        _release_file(self._filename, self._transfer_ownership)
+        if self._queued_write is not None:
+            filename, transfer_ownership = self._queued_write[1:3]
+            _release_file(filename, transfer_ownership, keep=self._filename)
+            self._queued_write = None
+
+        self.__update_error_cb(error)
+
+    def __update_reply_cb(self):
+        for reply_handler, error_handler in self._handlers:
+            reply_handler()
+        self._handlers = []
+
+    def __update_error_cb(self, error):
+        for reply_handler, error_handler in self._handlers:
+            error_handler(error)
+        self._handlers = []
+
+
+def _create_ds_entry_async(ds_object, properties, filename,
+                           transfer_ownership, reply_handler, error_handler,
+                           timeout):
+    request = _PendingCreate(filename, transfer_ownership)
+    ds_object._pending_create = request
+
+    def create_reply_cb(object_id):
+        # the object id may have been reset meanwhile, see Activity.copy()
+        if ds_object._pending_create is request:
+            ds_object.object_id = object_id
+            ds_object.metadata['uid'] = object_id
+        logging.debug('Created object %s in the datastore.', object_id)
+        request.created(object_id)
+        reply_handler()
+
+    def create_error_cb(error):
+        if ds_object._pending_create is request:
+            ds_object._pending_create = None
+        request.failed(error)
+        error_handler(error)
+
+    request.call = _call_async(
+        'create', 'a{sv}sb',
+        (dbus.Dictionary(properties), filename, transfer_ownership),
+        create_reply_cb, create_error_cb, timeout=timeout)
+
+
 def write(ds_object, update_mtime=True, transfer_ownership=False,
           reply_handler=None, error_handler=None, timeout=-1):
     """Write the DSObject given to the datastore. Creates a new entry if
@@ -358,12 +791,17 @@ def write(ds_object, update_mtime=True, transfer_ownership=False,
     transfer_ownership -- set it to true if the ownership of the entry should
                           be passed - who is responsible to delete the file
                           when done with it (default False)
-    reply_handler -- will be called with the method's return values as
-                     arguments (default None)
+    reply_handler -- will be called without arguments once the entry is
+                     written; for creates, the object_id of the DSObject
+                     is set by then (default None)
     error_handler -- will be called with an instance of a DBusException
                      representing a remote exception (default None)
     timeout -- dbus timeout for the caller to wait (default -1)
 
+    Writes of a DSObject whose asynchronous create is still in progress
+    are coalesced: only the last one is sent, once the object_id is
+    known, and the handlers of all of them are called when it's done.
+
     """
     logging.debug('datastore.write')
 
@@ -377,8 +815,20 @@ def write(ds_object, update_mtime=True, transfer_ownership=False,
     if file_path is None:
         file_path = ''
 
-    # FIXME: this func will be sync for creates regardless of the handlers
-    # supplied. This is very bad API, need to decide what to do here.
+    is_async = reply_handler and error_handler
+
+    pending_create = ds_object._pending_create
+    if pending_create is not None and not ds_object.object_id:
+        if is_async:
+            pending_create.queue_write(properties, file_path,
+                                       transfer_ownership, reply_handler,
+                                       error_handler, timeout)
+            logging.debug('Queued write until the object is created.')
+            return
+        pending_create.wait()
+        if pending_create.error is not None:
+            raise pending_create.error
+
     if ds_object.object_id:
         _update_ds_entry(ds_object.object_id,
                          properties,
@@ -387,14 +837,16 @@ def write(ds_object, update_mtime=True, transfer_ownership=False,
                          reply_handler=reply_handler,
                          error_handler=error_handler,
                          timeout=timeout)
+    elif is_async:
+        _create_ds_entry_async(ds_object, properties, file_path,
+                               transfer_ownership, reply_handler,
+                               error_handler, timeout)
+        logging.debug('Creating object in the datastore.')
+        return
     else:
-        if reply_handler or error_handler:
-            logging.warning('datastore.write() cannot currently be called'
-                            'async for creates, see ticket 3071')
         ds_object.object_id = _create_ds_entry(properties, file_path,
                                                transfer_ownership)
         ds_object.metadata['uid'] = ds_object.object_id
-        # TODO: register the object for updates
     logging.debug('Written object %s to the datastore.', ds_object.object_id)
 
 
@@ -406,6 +858,7 @@ def delete(object_id):
 
     """
     logging.debug('datastore.delete')
+    _metadata_cache.remove(object_id)
     _get_data_store().delete(object_id)
 
 
@@ -445,36 +898,218 @@ def find(query, sorting=None, limit=None, offset=None, properties=None,
     Return: DSObjects matching the query, number of matches
 
     """
-    query = query.copy()
+    if reply_handler and error_handler:
+        _find_async(query, sorting, limit, offset, properties, reply_handler,
+                    error_handler)
+        return
+
+    query = _get_find_query(query, sorting, limit, offset)
+    properties = properties or []
+    entries, total_count = _get_data_store().find(query, properties,
+                                                  byte_arrays=True)
+    ds_objects = []
+    for entry in entries:
+        object_id = entry['uid']
+        # only complete entries can be cached
+        if not properties:
+            _metadata_cache.set(object_id, entry)
+        del entry['uid']
+
+        ds_object = DSObject._from_properties(object_id, entry)
+        ds_objects.append(ds_object)
+
+    return ds_objects, total_count
 
-    if properties is None:
-        properties = []
 
+def _get_find_query(query, sorting, limit, offset):
+    query = query.copy()
     if sorting:
         query['order_by'] = sorting
     if limit:
         query['limit'] = limit
     if offset:
         query['offset'] = offset
+    return query
 
-    if reply_handler and error_handler:
-        _get_data_store().find(query, properties,
-                               reply_handler=reply_handler,
-                               error_handler=error_handler,
-                               byte_arrays=True)
-        return
-    else:
-        entries, total_count = _get_data_store().find(query, properties,
-                                                      byte_arrays=True)
-    ds_objects = []
-    for entry in entries:
-        object_id = entry['uid']
-        del entry['uid']
 
-        ds_object = DSObject(object_id, DSMetadata(entry), None)
-        ds_objects.append(ds_object)
+def _find_async(query, sorting=None, limit=None, offset=None,
+                properties=None, reply_handler=None, error_handler=None):
+    """find() with handlers, returning the PendingCall"""
+    query = _get_find_query(query, sorting, limit, offset)
+    properties = properties or []
 
-    return ds_objects, total_count
+    def find_reply_cb(entries, total_count):
+        # only complete entries can be cached
+        if not properties:
+            for entry in entries:
+                _metadata_cache.set(entry['uid'], entry)
+        reply_handler(entries, total_count)
+
+    return _call_async('find', 'a{sv}as', (query, properties), find_reply_cb,
+                       error_handler, byte_arrays=True)
+
+
+class PagedFind(object):
+    """Iterate over the DS entries matching a query, one page at a time.
+
+    Pages are fetched asynchronously, and the next page is requested
+    while the current one is being consumed, so only two pages are held
+    in memory at any time. Iterating over the object yields DSObjects,
+    pages() yields lists of them. Waiting for a page that has not
+    arrived yet blocks on its reply, without running the main loop.
+
+    Use find_paged() to create it.
+    """
+
+    def __init__(self, query, sorting=None, page_size=100, properties=None):
+        self._query = query
+        self._sorting = sorting
+        self._page_size = page_size
+        self._properties = properties
+        self._offset = 0
+        self._total_count = None
+        self._pending = None
+
+        self._request_page()
+
+    def _request_page(self):
+        request = {'done': False, 'entries': None, 'error': None}
+        self._pending = request
+        request['call'] = _find_async(
+            self._query, sorting=self._sorting, limit=self._page_size,
+            offset=self._offset, properties=self._properties,
+            reply_handler=partial(self.__find_reply_cb, request),
+            error_handler=partial(self.__find_error_cb, request))
+        self._offset += self._page_size
+
+    def __find_reply_cb(self, request, entries, total_count):
+        request['entries'] = entries
+        request['done'] = True
+        self._total_count = total_count
+
+    def __find_error_cb(self, request, error):
+        request['error'] = error
+        request['done'] = True
+
+    def get_total_count(self):
+        """Number of matches, or None before the first page arrived"""
+        return self._total_count
+
+    def next_page(self):
+        """Return the next page of DSObjects, or None when done"""
+        request = self._pending
+        if request is None:
+            return None
+
+        if not request['done']:
+            request['call'].block()
+
+        if request['error'] is not None:
+            self._pending = None
+            raise request['error']
+
+        entries = request['entries']
+        if len(entries) == self._page_size and \
+                self._offset < self._total_count:
+            self._request_page()
+        else:
+            self._pending = None
+
+        if not entries:
+            return None
+
+        ds_objects = []
+        for entry in entries:
+            object_id = entry['uid']
+            del entry['uid']
+            ds_objects.append(DSObject._from_properties(object_id, entry))
+        return ds_objects
+
+    def pages(self):
+        while True:
+            page = self.next_page()
+            if page is None:
+                return
+            yield page
+
+    def __iter__(self):
+        for page in self.pages():
+            for ds_object in page:
+                yield ds_object
+
+    def cancel(self):
+        """Stop fetching pages, a reply still on its way is dropped"""
+        if self._pending is not None and not self._pending['done']:
+            self._pending['call'].cancel()
+        self._pending = None
+
+
+def find_paged(query, sorting=None, page_size=100, properties=None):
+    """Find DS entries that match the query provided, page by page.
+
+    Keyword arguments:
+    query -- a dictionary containing metadata key value pairs, see find()
+    sorting -- key to order results by e.g. 'timestamp' (default None)
+    page_size -- number of entries fetched per D-Bus call (default 100)
+    properties -- you can specify here a list of metadata you want to be
+                  present in the result e.g. ['title, 'keep'] (default None)
+
+    Return: a PagedFind iterating over the matching DSObjects
+
+    """
+    return PagedFind(query, sorting, page_size, properties)
+
+
+# from linux/fs.h
+_FICLONE = 0x40049409
+
+
+def _copy_data(source, dest):
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while os.copy_file_range(source.fileno(), dest.fileno(),
+                                     1024 * 1024 * 1024):
+                pass
+            return
+        except OSError:
+            source.seek(0)
+            dest.seek(0)
+            dest.truncate()
+
+    shutil.copyfileobj(source, dest)
+
+
+def _clone_file(file_path):
+    """Make a copy of file_path we own, next to it. The data blocks are
+    shared when the filesystem can reflink, otherwise a hard link is used
+    and, as a last resort, the kernel copies the data."""
+    fd, clone_path = tempfile.mkstemp(prefix='copy',
+                                      dir=os.path.dirname(file_path))
+    try:
+        with open(file_path, 'rb') as source:
+            with os.fdopen(fd, 'wb') as dest:
+                try:
+                    fcntl.ioctl(dest.fileno(), _FICLONE, source.fileno())
+                    return clone_path
+                except (IOError, OSError):
+                    pass
+
+                try:
+                    os.unlink(clone_path)
+                    os.link(file_path, clone_path)
+                    return clone_path
+                except OSError:
+                    pass
+
+        with open(file_path, 'rb') as source:
+            with open(clone_path, 'wb') as dest:
+                _copy_data(source, dest)
+    except BaseException:
+        if os.path.exists(clone_path):
+            os.remove(clone_path)
+        raise
+
+    return clone_path
 
 
 def copy(ds_object, mount_point):
@@ -503,9 +1138,15 @@ def copy(ds_object, mount_point):
         new_ds_object.metadata['suggested_filename'] = filename
 
     # this will cause the file be retrieved from the DS
-    new_ds_object.file_path = ds_object.file_path
-
-    write(new_ds_object)
+    file_path = ds_object.file_path
+    if not file_path:
+        write(new_ds_object)
+        return new_ds_object
+
+    # hand the datastore a copy sharing the data of the exported file,
+    # so it can move it into place instead of copying it again
+    new_ds_object.file_path = _clone_file(file_path)
+    write(new_ds_object, transfer_ownership=True)
 
     return new_ds_object
 
@@ -103,6 +103,12 @@ class Signal(object):
             if r_key == lookup_key:
                 del self.receivers[idx]
 
+    def has_listeners(self, sender=None):
+        """Whether any live receiver is connected for sender"""
+        for receiver in self._live_receivers(_make_id(sender)):
+            return True
+        return False
+
     def send(self, sender, **named):
         """Send signal from sender to all connected receivers.
 
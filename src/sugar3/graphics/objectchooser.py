@@ -20,14 +20,21 @@ STABLE.
 """
 
 import six
+import os
 import logging
+import hashlib
+import tempfile
+import collections
 import cairo
 
 from gi.repository import GObject
+from gi.repository import GLib
 from gi.repository import Gtk
 from gi.repository import Gdk
+from gi.repository import GdkPixbuf
 import dbus
 
+from sugar3 import env
 from sugar3.datastore import datastore
 from sugar3.activity.activity import PREVIEW_SIZE
 
@@ -40,11 +47,107 @@ FILTER_TYPE_MIME_BY_ACTIVITY = 'mime_by_activity'
 FILTER_TYPE_GENERIC_MIME = 'generic_mime'
 FILTER_TYPE_ACTIVITY = 'activity'
 
+# Scaled previews are cached on disk, keyed by the hash of the preview
+# data and the size, and the most recently used ones are kept in memory.
+_THUMBNAILS_DIR = 'thumbnails'
+_MAX_THUMBNAILS = 1000
+_MAX_MEMORY_THUMBNAILS = 64
+
+_thumbnails = collections.OrderedDict()
+
+
+def _get_thumbnail_path(key):
+    return os.path.join(env.get_profile_path(_THUMBNAILS_DIR), key + '.png')
+
+
+def _touch_thumbnail(key):
+    # the least recently used thumbnails are evicted first
+    try:
+        os.utime(_get_thumbnail_path(key), None)
+    except OSError:
+        pass
+
+
+def _load_thumbnail(key):
+    path = _get_thumbnail_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+    except GLib.GError:
+        logging.warning('Could not load the cached thumbnail %s' % path)
+        return None
+    _touch_thumbnail(key)
+    return pixbuf
+
+
+def _save_thumbnail(key, pixbuf):
+    thumbnails_dir = env.get_profile_path(_THUMBNAILS_DIR)
+    try:
+        if not os.path.isdir(thumbnails_dir):
+            os.makedirs(thumbnails_dir)
+
+        names = os.listdir(thumbnails_dir)
+        if len(names) >= _MAX_THUMBNAILS:
+            paths = [os.path.join(thumbnails_dir, name) for name in names]
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - _MAX_THUMBNAILS + 1]:
+                os.remove(path)
+
+        fd, temp_path = tempfile.mkstemp(dir=thumbnails_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            pixbuf.savev(temp_path, 'png', [], [])
+            os.rename(temp_path, _get_thumbnail_path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    except (OSError, GLib.GError) as e:
+        logging.warning('Could not cache the thumbnail: %s' % e)
+
+
+def _scale_preview(preview_data, width, height):
+    pixbuf = None
+
+    png_file = six.BytesIO(preview_data)
+    try:
+        # Load image and scale to dimensions
+        surface = cairo.ImageSurface.create_from_png(png_file)
+        png_width = surface.get_width()
+        png_height = surface.get_height()
+
+        preview_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                             width, height)
+        cr = cairo.Context(preview_surface)
+
+        scale_w = width * 1.0 / png_width
+        scale_h = height * 1.0 / png_height
+        scale = min(scale_w, scale_h)
+
+        cr.scale(scale, scale)
+
+        cr.set_source_rgba(1, 1, 1, 0)
+        cr.set_operator(cairo.OPERATOR_SOURCE)
+        cr.paint()
+        cr.set_source_surface(surface)
+        cr.paint()
+
+        pixbuf = Gdk.pixbuf_get_from_surface(preview_surface, 0, 0,
+                                             width, height)
+    except Exception:
+        logging.exception('Error while loading the preview')
+
+    return pixbuf
+
 
 def get_preview_pixbuf(preview_data, width=-1, height=-1):
     """
     Retrive a pixbuf with the content of the preview field
 
+    The scaled pixbuf is cached, so the same preview is only decoded
+    once for each size. A copy of the cached pixbuf is returned, so the
+    caller may modify it.
+
     Args:
         metadata (dictionary): preview data from the metadata dictionary. Can't
             be None. Returned from the
@@ -76,43 +179,33 @@ def get_preview_pixbuf(preview_data, width=-1, height=-1):
     if height == -1:
         height = PREVIEW_SIZE[1]
 
-    pixbuf = None
-
-    if len(preview_data) > 4:
-        if preview_data[1:4] != b'PNG':
-            # TODO: We are close to be able to drop this.
-            import base64
-            preview_data = base64.b64decode(preview_data)
-
-        png_file = six.BytesIO(preview_data)
-        try:
-            # Load image and scale to dimensions
-            surface = cairo.ImageSurface.create_from_png(png_file)
-            png_width = surface.get_width()
-            png_height = surface.get_height()
-
-            preview_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
-                                                 width, height)
-            cr = cairo.Context(preview_surface)
-
-            scale_w = width * 1.0 / png_width
-            scale_h = height * 1.0 / png_height
-            scale = min(scale_w, scale_h)
-
-            cr.scale(scale, scale)
-
-            cr.set_source_rgba(1, 1, 1, 0)
-            cr.set_operator(cairo.OPERATOR_SOURCE)
-            cr.paint()
-            cr.set_source_surface(surface)
-            cr.paint()
+    if len(preview_data) <= 4:
+        return None
+
+    if preview_data[1:4] != b'PNG':
+        # TODO: We are close to be able to drop this.
+        import base64
+        preview_data = base64.b64decode(preview_data)
+
+    key = '%s-%dx%d' % (hashlib.sha1(preview_data).hexdigest(),
+                        width, height)
+
+    pixbuf = _thumbnails.pop(key, None)
+    if pixbuf is not None:
+        _touch_thumbnail(key)
+    else:
+        pixbuf = _load_thumbnail(key)
+    if pixbuf is None:
+        pixbuf = _scale_preview(preview_data, width, height)
+        if pixbuf is None:
+            return None
+        _save_thumbnail(key, pixbuf)
 
-            pixbuf = Gdk.pixbuf_get_from_surface(preview_surface, 0, 0,
-                                                 width, height)
-        except Exception:
-            logging.exception('Error while loading the preview')
+    _thumbnails[key] = pixbuf
+    while len(_thumbnails) > _MAX_MEMORY_THUMBNAILS:
+        _thumbnails.popitem(last=False)
 
-    return pixbuf
+    return pixbuf.copy()
 
 
 class ObjectChooser(object):
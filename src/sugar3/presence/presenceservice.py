@@ -21,6 +21,8 @@ STABLE.
 """
 
 import logging
+from functools import partial
+
 import dbus
 import dbus.exceptions
 from dbus import PROPERTIES_IFACE
@@ -90,16 +92,8 @@ class PresenceService(GObject.GObject):
                         activity_id,
                         dbus_interface=CONN_INTERFACE_ACTIVITY_PROPERTIES)
                 except dbus.exceptions.DBusException as e:
-                    name = 'org.freedesktop.Telepathy.Error.NotAvailable'
-                    if e.get_dbus_name() == name:
-                        logging.debug("There's no shared activity with the id "
-                                      "%s" % activity_id)
-                    elif e.get_dbus_name() == \
-                            'org.freedesktop.DBus.Error.UnknownMethod':
-                        logging.warning(
-                            'Telepathy Account %r does not support '
-                            'Sugar collaboration', account_path)
-                    else:
+                    if not _is_activity_not_found(e, activity_id,
+                                                  account_path):
                         raise
                 else:
                     activity = Activity(account_path, connection.connection,
@@ -109,6 +103,78 @@ class PresenceService(GObject.GObject):
 
         return None
 
+    def get_activity_async(self, activity_id, reply_handler, error_handler):
+        """Retrieve single Activity object for the given unique id without
+        blocking
+
+        activity_id -- unique ID for the activity
+        reply_handler -- called with the Activity object, or None if the
+            activity is not found on any connected account
+        error_handler -- called with the exception of an unexpected failure
+
+        The GetActivity calls for all the connected accounts are issued at
+        once, so the lookup takes as long as the slowest account instead of
+        the sum of all of them.
+
+        Returns the list of dbus PendingCalls, empty if a handler was
+        already called. Blocking on all of them waits for the result
+        without running the main loop.
+        """
+        if self._activity_cache is not None:
+            if self._activity_cache.props.id != activity_id:
+                error_handler(RuntimeError('Activities can only access their'
+                                           ' own shared instance'))
+            else:
+                reply_handler(self._activity_cache)
+            return []
+
+        connection_manager = get_connection_manager()
+        connections_per_account = \
+            connection_manager.get_connections_per_account()
+        connections = [(account_path, connection) for account_path, connection
+                       in list(connections_per_account.items())
+                       if connection.connected]
+        if not connections:
+            reply_handler(None)
+            return []
+
+        state = {'pending': len(connections), 'done': False}
+
+        def get_activity_reply_cb(account_path, connection, room_handle):
+            if state['done']:
+                return
+            state['done'] = True
+            activity = Activity(account_path, connection,
+                                room_handle=room_handle)
+            self._activity_cache = activity
+            reply_handler(activity)
+
+        def get_activity_error_cb(account_path, e):
+            if state['done']:
+                return
+            if not _is_activity_not_found(e, activity_id, account_path):
+                state['done'] = True
+                error_handler(e)
+                return
+            state['pending'] -= 1
+            if state['pending'] == 0:
+                state['done'] = True
+                reply_handler(None)
+
+        bus = dbus.SessionBus()
+        calls = []
+        for account_path, connection in connections:
+            logging.debug('Calling GetActivity on %s' % account_path)
+            calls.append(bus.call_async(
+                connection.connection.bus_name,
+                connection.connection.object_path,
+                CONN_INTERFACE_ACTIVITY_PROPERTIES, 'GetActivity', 's',
+                (activity_id,),
+                partial(get_activity_reply_cb, account_path,
+                        connection.connection),
+                partial(get_activity_error_cb, account_path)))
+        return calls
+
     def get_activity_by_handle(self, connection_path, room_handle):
         if self._activity_cache is not None:
             if self._activity_cache.room_handle != room_handle:
@@ -263,6 +329,23 @@ class PresenceService(GObject.GObject):
         raise NotImplementedError()
 
 
+def _is_activity_not_found(error, activity_id, account_path):
+    """Whether a GetActivity error just means the account doesn't know
+    the activity"""
+    name = 'org.freedesktop.Telepathy.Error.NotAvailable'
+    if error.get_dbus_name() == name:
+        logging.debug("There's no shared activity with the id "
+                      "%s" % activity_id)
+        return True
+    elif error.get_dbus_name() == \
+            'org.freedesktop.DBus.Error.UnknownMethod':
+        logging.warning(
+            'Telepathy Account %r does not support '
+            'Sugar collaboration', account_path)
+        return True
+    return False
+
+
 _ps = None
 
 
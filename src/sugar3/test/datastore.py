@@ -0,0 +1,313 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+UNSTABLE.
+
+In-memory stand-in for the org.laptop.sugar.DataStore service, to test
+and benchmark :mod:`sugar3.datastore.datastore` without a Sugar shell.
+
+The client makes blocking calls, so the service has to run in another
+process: use private_session_bus() and start_data_store(), or run this
+module directly.
+"""
+
+import os
+import sys
+import time
+import uuid
+import shutil
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+DS_DBUS_SERVICE = 'org.laptop.sugar.DataStore'
+DS_DBUS_INTERFACE = 'org.laptop.sugar.DataStore'
+DS_DBUS_PATH = '/org/laptop/sugar/DataStore'
+
+# Extra methods to drive the stand-in from tests
+TEST_DBUS_INTERFACE = 'org.sugarlabs.test.DataStore'
+
+_TEXT_PROPERTIES = ['title', 'description', 'tags']
+
+
+class NotFoundError(dbus.DBusException):
+    _dbus_error_name = 'org.laptop.sugar.DataStore.Error.NotFound'
+
+
+class DataStore(dbus.service.Object):
+    """Keeps the entries in memory and their files in a temporary
+    directory. Queries support exact matches (or any of a list of
+    values), {'start': ..., 'end': ...} ranges, a substring 'query'
+    on the text properties, 'order_by', 'limit' and 'offset'."""
+
+    def __init__(self, bus=None, root=None):
+        if bus is None:
+            bus = dbus.SessionBus()
+        self._bus_name = dbus.service.BusName(DS_DBUS_SERVICE, bus=bus)
+        dbus.service.Object.__init__(self, self._bus_name, DS_DBUS_PATH)
+
+        if root is None:
+            root = tempfile.mkdtemp(prefix='datastore')
+        self._root = root
+        self._exports_dir = os.path.join(root, 'exports')
+        os.makedirs(self._exports_dir)
+
+        self._entries = {}
+        self._files = {}
+
+    def _get_entry(self, uid):
+        if uid not in self._entries:
+            raise NotFoundError('No entry with uid %s' % uid)
+        return self._entries[uid]
+
+    def _store_file(self, uid, file_path, transfer_ownership):
+        if not file_path:
+            return
+        path = os.path.join(self._root, uid)
+        if transfer_ownership:
+            try:
+                os.rename(file_path, path)
+            except OSError:
+                shutil.copyfile(file_path, path)
+                os.remove(file_path)
+        else:
+            shutil.copyfile(file_path, path)
+        self._files[uid] = path
+
+    @dbus.service.method(DS_DBUS_INTERFACE, in_signature='a{sv}sb',
+                         out_signature='s')
+    def create(self, props, file_path, transfer_ownership):
+        uid = str(uuid.uuid4())
+        props = dict(props)
+        props['uid'] = uid
+        self._entries[uid] = props
+        self._store_file(uid, file_path, transfer_ownership)
+        self.Created(uid)
+        return uid
+
+    @dbus.service.method(DS_DBUS_INTERFACE, in_signature='sa{sv}sb',
+                         out_signature='')
+    def update(self, uid, props, file_path, transfer_ownership):
+        self._get_entry(uid)
+        props = dict(props)
+        props['uid'] = uid
+        self._entries[uid] = props
+        self._store_file(uid, file_path, transfer_ownership)
+        self.Updated(uid)
+
+    @dbus.service.method(DS_DBUS_INTERFACE, in_signature='a{sv}as',
+                         out_signature='aa{sv}u')
+    def find(self, query, properties):
+        query = dict(query)
+        offset = int(query.pop('offset', 0))
+        limit = query.pop('limit', None)
+        order_by = query.pop('order_by', ['-timestamp'])
+        text = query.pop('query', None)
+
+        entries = [entry for entry in self._entries.values()
+                   if _matches(entry, query, text)]
+
+        if isinstance(order_by, (str, dbus.String)):
+            order_by = [order_by]
+        for key in reversed(order_by):
+            reverse = key.startswith('-')
+            key = key.lstrip('+-')
+            entries.sort(key=lambda entry: _sort_key(entry.get(key)),
+                         reverse=reverse)
+
+        total_count = len(entries)
+        if limit:
+            entries = entries[offset:offset + int(limit)]
+        else:
+            entries = entries[offset:]
+
+        results = []
+        for entry in entries:
+            if properties:
+                entry = dict([(key, value) for key, value in entry.items()
+                              if key in properties])
+            results.append(dbus.Dictionary(entry, signature='sv'))
+        return dbus.Array(results, signature='a{sv}'), total_count
+
+    @dbus.service.method(DS_DBUS_INTERFACE, in_signature='s',
+                         out_signature='a{sv}')
+    def get_properties(self, uid):
+        return dbus.Dictionary(self._get_entry(uid), signature='sv')
+
+    @dbus.service.method(DS_DBUS_INTERFACE, in_signature='s',
+                         out_signature='s')
+    def get_filename(self, uid):
+        self._get_entry(uid)
+        if uid not in self._files:
+            return ''
+        fd, path = tempfile.mkstemp(dir=self._exports_dir)
+        os.close(fd)
+        os.unlink(path)
+        os.link(self._files[uid], path)
+        return path
+
+    @dbus.service.method(DS_DBUS_INTERFACE, in_signature='sa{sv}',
+                         out_signature='as')
+    def get_uniquevaluesfor(self, propertyname, query):
+        values = set()
+        for entry in self._entries.values():
+            if propertyname in entry:
+                values.add(entry[propertyname])
+        return sorted(values)
+
+    @dbus.service.method(DS_DBUS_INTERFACE, in_signature='s',
+                         out_signature='')
+    def delete(self, uid):
+        self._get_entry(uid)
+        del self._entries[uid]
+        path = self._files.pop(uid, None)
+        if path is not None:
+            os.remove(path)
+        self.Deleted(uid)
+
+    @dbus.service.signal(DS_DBUS_INTERFACE, signature='s')
+    def Created(self, uid):
+        pass
+
+    @dbus.service.signal(DS_DBUS_INTERFACE, signature='s')
+    def Updated(self, uid):
+        pass
+
+    @dbus.service.signal(DS_DBUS_INTERFACE, signature='s')
+    def Deleted(self, uid):
+        pass
+
+    @dbus.service.signal(DS_DBUS_INTERFACE, signature='')
+    def Stopped(self):
+        pass
+
+    @dbus.service.method(TEST_DBUS_INTERFACE, in_signature='as',
+                         out_signature='')
+    def emit_updated(self, uids):
+        """Emit Updated for the entries given, as a bulk import would"""
+        for uid in uids:
+            self._get_entry(uid)
+            self.Updated(uid)
+
+    @dbus.service.method(TEST_DBUS_INTERFACE, in_signature='a{sv}u',
+                         out_signature='as')
+    def populate(self, props, count):
+        """Create count entries with the properties given, quietly"""
+        uids = []
+        timestamp = int(time.time())
+        for i in range(count):
+            uid = str(uuid.uuid4())
+            entry = dict(props)
+            entry['uid'] = uid
+            entry.setdefault('title', 'Entry %d' % i)
+            entry.setdefault('timestamp', timestamp + i)
+            self._entries[uid] = entry
+            uids.append(uid)
+        return uids
+
+
+def _matches(entry, query, text):
+    for key, value in query.items():
+        entry_value = entry.get(key)
+        if isinstance(value, (list, dbus.Array)):
+            if entry_value not in value:
+                return False
+        elif isinstance(value, (dict, dbus.Dictionary)):
+            if entry_value is None:
+                return False
+            if 'start' in value and entry_value < value['start']:
+                return False
+            if 'end' in value and entry_value > value['end']:
+                return False
+        elif entry_value != value:
+            return False
+
+    if text:
+        text = text.rstrip('*').lower()
+        for key in _TEXT_PROPERTIES:
+            if text in str(entry.get(key, '')).lower():
+                return True
+        return False
+
+    return True
+
+
+def _sort_key(value):
+    if value is None:
+        return (0, '')
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (2, str(value))
+
+
+@contextmanager
+def private_session_bus():
+    """Run a session bus of our own for the duration of the block
+
+    It must be entered before anything connects to the session bus.
+    """
+    process = subprocess.Popen(['dbus-daemon', '--session', '--nofork',
+                                '--print-address'],
+                               stdout=subprocess.PIPE)
+    address = process.stdout.readline().decode().strip()
+    old_address = os.environ.get('DBUS_SESSION_BUS_ADDRESS')
+    os.environ['DBUS_SESSION_BUS_ADDRESS'] = address
+    try:
+        yield address
+    finally:
+        process.terminate()
+        process.wait()
+        process.stdout.close()
+        if old_address is None:
+            del os.environ['DBUS_SESSION_BUS_ADDRESS']
+        else:
+            os.environ['DBUS_SESSION_BUS_ADDRESS'] = old_address
+
+
+def start_data_store(timeout=10):
+    """Run the stand-in in a new process on the current session bus and
+    wait until it owns the datastore name. Returns the process."""
+    process = subprocess.Popen([sys.executable, '-m', 'sugar3.test.datastore'])
+
+    bus = dbus.SessionBus()
+    deadline = time.time() + timeout
+    while not bus.name_has_owner(DS_DBUS_SERVICE):
+        if process.poll() is not None or time.time() > deadline:
+            process.kill()
+            raise RuntimeError('The datastore stand-in did not start')
+        time.sleep(0.05)
+
+    return process
+
+
+def main():
+    DBusGMainLoop(set_as_default=True)
+    root = tempfile.mkdtemp(prefix='datastore')
+    try:
+        DataStore(root=root)
+        GLib.MainLoop().run()
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
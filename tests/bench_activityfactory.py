@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Launch latency benchmark for the activity factory
+
+Compares, with the open files limit raised as high as allowed, a
+brute-force descriptor closing loop with
+ActivityCreationHandler._create_activity() launching a bundle whose
+command is true(1), until its exit is handled. The launch relies on
+subprocess closing the descriptors, so it should not depend on the
+limit. The shell is replaced by a stub and the profile by a temporary
+one.
+
+Usage: bench_activityfactory.py [iterations]
+"""
+
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+
+from gi.repository import GLib
+from gi.repository import GObject
+
+from sugar3 import env
+from sugar3.activity import activityfactory
+from sugar3.activity.activityhandle import ActivityHandle
+
+_MAX_LIMIT = 1024 * 1024
+
+
+def _raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY:
+        hard = _MAX_LIMIT
+    limit = min(hard, _MAX_LIMIT)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    return limit
+
+
+def _brute_force_close_fds(maxfd):
+    for i in range(3, maxfd):
+        try:
+            os.close(i)
+        except Exception:
+            pass
+
+
+def _time_in_child(function, iterations):
+    start = time.time()
+    for i in range(iterations):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                function()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+    return (time.time() - start) / iterations
+
+
+class _Bundle(object):
+    def __init__(self, path):
+        self._path = path
+
+    def get_bundle_id(self):
+        return 'org.sugarlabs.Benchmark'
+
+    def get_path(self):
+        return self._path
+
+    def get_command(self):
+        return 'true'
+
+
+class _Shell(object):
+    def NotifyLaunch(self, *args, **kwargs):
+        pass
+
+
+class _CreationHandler(activityfactory.ActivityCreationHandler):
+    """Launches through the factory without a shell to talk to"""
+
+    def __init__(self, bundle, handle):
+        GObject.GObject.__init__(self)
+        self._bundle = bundle
+        self._service_name = bundle.get_bundle_id()
+        self._handle = handle
+        self._shell = _Shell()
+
+
+def _time_create_activity(iterations):
+    bundle = _Bundle(tempfile.mkdtemp())
+    bundle_logs = activityfactory._get_bundle_logs(bundle.get_bundle_id())
+    context = GLib.MainContext.default()
+
+    start = time.time()
+    for i in range(iterations):
+        handler = _CreationHandler(bundle, ActivityHandle())
+        handler._create_activity()
+        # the log file is released once the exit has been handled
+        while bundle_logs.active:
+            context.iteration(True)
+    duration = time.time() - start
+
+    shutil.rmtree(bundle.get_path())
+    return duration / iterations
+
+
+def main():
+    iterations = 10
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+
+    limit = _raise_fd_limit()
+    print('open files limit: %d, %d iterations' % (limit, iterations))
+
+    sugar_home = tempfile.mkdtemp()
+    os.environ['SUGAR_HOME'] = sugar_home
+    os.makedirs(env.get_logs_path())
+
+    results = [
+        ('brute-force close loop',
+         _time_in_child(lambda: _brute_force_close_fds(limit), iterations)),
+        ('_create_activity',
+         _time_create_activity(iterations)),
+    ]
+    shutil.rmtree(sugar_home)
+
+    for name, seconds in results:
+        print('%-30s %10.3f ms' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Benchmark for the datastore client
+
+Runs the datastore stand-in from sugar3.test.datastore on a private
+session bus, fills it with entries, and times the common calls of
+sugar3.datastore.datastore against it: get, find and find_paged over
+the whole journal, get_many, write, copy and a storm of Updated
+signals.
+
+Usage: bench_datastore.py [entries]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import dbus
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from sugar3.test import datastore as stand_in
+
+_WRITES = 200
+_PAGE_SIZE = 100
+_SIGNAL_TIMEOUT = 60
+
+
+def _time(function, iterations=1):
+    start = time.time()
+    for i in range(iterations):
+        function()
+    return (time.time() - start) / iterations
+
+
+def _get_test_interface():
+    bus = dbus.SessionBus()
+    return dbus.Interface(bus.get_object(stand_in.DS_DBUS_SERVICE,
+                                         stand_in.DS_DBUS_PATH),
+                          stand_in.TEST_DBUS_INTERFACE)
+
+
+def _flush_datastore_cache(datastore):
+    datastore._metadata_cache.clear()
+
+
+def _bench_get(datastore, uids):
+    # the cached case gets a working set that fits in the metadata cache
+    working_set = uids[:datastore._METADATA_CACHE_SIZE // 2]
+
+    def get_all(object_ids):
+        for object_id in object_ids:
+            datastore.get(object_id).destroy()
+
+    _flush_datastore_cache(datastore)
+    cold = _time(lambda: get_all(uids)) / len(uids)
+    get_all(working_set)
+    warm = _time(lambda: get_all(working_set), 10) / len(working_set)
+    return [('get, not cached', cold), ('get, cached', warm)]
+
+
+def _bench_find(datastore, uids):
+    def find_all():
+        ds_objects, total_count = datastore.find(
+            {}, properties=['uid', 'title'])
+        for ds_object in ds_objects:
+            ds_object.destroy()
+
+    def find_paged_all():
+        for ds_object in datastore.find_paged({}, page_size=_PAGE_SIZE,
+                                              properties=['uid', 'title']):
+            ds_object.destroy()
+
+    def find_first_page():
+        ds_objects, total_count = datastore.find(
+            {}, sorting=['-timestamp'], limit=_PAGE_SIZE,
+            properties=['uid', 'title'])
+        for ds_object in ds_objects:
+            ds_object.destroy()
+
+    def get_many_all():
+        _flush_datastore_cache(datastore)
+        for ds_object in datastore.get_many(uids):
+            ds_object.destroy()
+
+    return [('find, all entries', _time(find_all)),
+            ('find_paged, all entries', _time(find_paged_all)),
+            ('find, first page', _time(find_first_page, 10)),
+            ('get_many, all entries', _time(get_many_all))]
+
+
+def _bench_write(datastore, file_path):
+    ds_objects = []
+
+    def create():
+        ds_object = datastore.create()
+        ds_object.metadata['title'] = 'Benchmark'
+        ds_object.metadata['activity'] = 'org.sugarlabs.Benchmark'
+        datastore.write(ds_object)
+        ds_objects.append(ds_object)
+
+    def update():
+        ds_object = ds_objects[-1]
+        ds_object.metadata['title'] = 'Benchmark updated'
+        datastore.write(ds_object)
+
+    def create_async():
+        state = {'pending': _WRITES}
+
+        def reply_cb():
+            state['pending'] -= 1
+
+        def error_cb(error):
+            raise error
+
+        for i in range(_WRITES):
+            ds_object = datastore.create()
+            ds_object.metadata['title'] = 'Benchmark'
+            datastore.write(ds_object, reply_handler=reply_cb,
+                            error_handler=error_cb)
+            ds_objects.append(ds_object)
+
+        context = GLib.MainContext.default()
+        while state['pending']:
+            context.iteration(True)
+
+    results = [('write, create', _time(create, _WRITES)),
+               ('write, update', _time(update, _WRITES)),
+               ('write, async creates', _time(create_async) / _WRITES)]
+
+    ds_object = ds_objects[0]
+    ds_object.file_path = file_path
+    datastore.write(ds_object)
+
+    def copy():
+        datastore.copy(ds_object, '/').destroy()
+
+    results.append(('copy', _time(copy, _WRITES)))
+
+    for ds_object in ds_objects:
+        ds_object.destroy()
+    return results
+
+
+def _bench_signals(datastore, uids):
+    received = set()
+
+    def updated_cb(sender, object_id, metadata, **kwargs):
+        received.add(object_id)
+
+    datastore.updated.connect(updated_cb)
+    start = time.time()
+    _get_test_interface().emit_updated(uids)
+
+    context = GLib.MainContext.default()
+    deadline = start + _SIGNAL_TIMEOUT
+    while len(received) < len(uids) and time.time() < deadline:
+        context.iteration(True)
+    duration = time.time() - start
+    datastore.updated.disconnect(updated_cb)
+
+    if len(received) < len(uids):
+        print('only %d of %d Updated signals handled' %
+              (len(received), len(uids)))
+    return [('Updated signal storm', duration)]
+
+
+def main():
+    count = 10000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+
+    DBusGMainLoop(set_as_default=True)
+
+    with stand_in.private_session_bus():
+        process = stand_in.start_data_store()
+        try:
+            from sugar3.datastore import datastore
+
+            uids = [str(uid) for uid in _get_test_interface().populate(
+                {'activity': 'org.sugarlabs.Benchmark',
+                 'mime_type': 'text/plain',
+                 'description': 'x' * 256}, count)]
+            print('%d entries' % count)
+
+            fd, file_path = tempfile.mkstemp()
+            with os.fdopen(fd, 'wb') as f:
+                f.write(os.urandom(1024 * 1024))
+
+            results = _bench_get(datastore, uids) + \
+                _bench_find(datastore, uids) + \
+                _bench_write(datastore, file_path) + \
+                _bench_signals(datastore, uids)
+
+            os.remove(file_path)
+        finally:
+            process.terminate()
+            process.wait()
+
+    for name, seconds in results:
+        print('%-30s %10.3f ms' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
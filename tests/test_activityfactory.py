@@ -0,0 +1,126 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sugar3.activity import activityfactory
+
+_BUNDLE_ID = 'org.sugarlabs.Test'
+
+
+class _Bundle(object):
+    def get_bundle_id(self):
+        return _BUNDLE_ID
+
+
+class TestLogFiles(unittest.TestCase):
+    def setUp(self):
+        self._logs_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._logs_dir)
+        for patcher in [
+                mock.patch.dict(os.environ,
+                                {'SUGAR_LOGS_DIR': self._logs_dir}),
+                mock.patch.dict(activityfactory._bundle_logs, clear=True)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get_path(self, index):
+        return os.path.join(self._logs_dir,
+                            '%s-%d.log' % (_BUNDLE_ID, index))
+
+    def _open(self, data='', release=True):
+        path, log_file = activityfactory.open_log_file(_Bundle())
+        log_file.write(data)
+        log_file.close()
+        if release:
+            activityfactory._release_log_file(path)
+        return path
+
+    def _get_existing(self):
+        return sorted(os.listdir(self._logs_dir),
+                      key=lambda name: int(name[len(_BUNDLE_ID) + 1:-4]))
+
+    def test_names_follow_existing(self):
+        for index in [3, 7]:
+            open(self._get_path(index), 'w').close()
+        self.assertEqual(self._open(), self._get_path(8))
+        self.assertEqual(self._open(), self._get_path(9))
+
+    def test_released_name_not_reused(self):
+        path = self._open()
+        os.remove(path)
+        self.assertEqual(self._open(), self._get_path(2))
+
+    def test_name_taken_meanwhile(self):
+        activityfactory._get_bundle_logs(_BUNDLE_ID)
+        open(self._get_path(1), 'w').close()
+        self.assertEqual(self._open(), self._get_path(2))
+
+    def test_rotation_by_count(self):
+        count = activityfactory._MAX_BUNDLE_LOGS + 5
+        for i in range(count):
+            self._open()
+        self.assertEqual(
+            self._get_existing(),
+            [os.path.basename(self._get_path(index))
+             for index in range(6, count + 1)])
+
+    def test_active_logs_not_rotated(self):
+        count = activityfactory._MAX_BUNDLE_LOGS + 5
+        for i in range(count):
+            self._open(release=False)
+        self.assertEqual(len(self._get_existing()), count)
+
+        # released logs go at the next rotation
+        for index in range(1, count + 1):
+            activityfactory._release_log_file(self._get_path(index))
+        self._open()
+        self.assertEqual(len(self._get_existing()),
+                         activityfactory._MAX_BUNDLE_LOGS)
+
+    def test_rotation_by_size(self):
+        with mock.patch.object(activityfactory, '_MAX_BUNDLE_LOGS_SIZE', 100):
+            for i in range(3):
+                self._open('x' * 60)
+            self._open()
+        self.assertEqual(
+            self._get_existing(),
+            [os.path.basename(self._get_path(index)) for index in [3, 4]])
+
+
+class TestChildWatch(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._temp_dir)
+
+    def _exit(self, is_child):
+        log_path = os.path.join(self._temp_dir, 'org.sugarlabs.Test-1.log')
+        log_file = open(log_path, 'w')
+        with mock.patch('os.waitpid') as waitpid:
+            activityfactory._child_watch_cb(
+                1234, 0, (log_file, log_path, 'activity-id', is_child))
+        self.assertTrue(log_file.closed)
+        return waitpid
+
+    def test_child_reaped(self):
+        self._exit(True).assert_called_once_with(1234, 0)
+
+    def test_zygote_child_not_reaped(self):
+        self.assertFalse(self._exit(False).called)
@@ -0,0 +1,52 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import io
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+
+import dbus
+
+from sugar3.activity import activityinstance
+from sugar3.activity.activityhandle import ActivityHandle
+
+_SERVICE_NAME = 'org.sugarlabs.Test'
+
+
+class TestSingleProcess(unittest.TestCase):
+    def _create(self, error=None):
+        handle = ActivityHandle('activity-id')
+        with mock.patch('dbus.SessionBus') as session_bus:
+            remote = session_bus.return_value.get_object.return_value
+            remote.create.side_effect = error
+            with redirect_stdout(io.StringIO()):
+                created = activityinstance._create_in_single_process(
+                    _SERVICE_NAME,
+                    activityinstance.get_single_process_path(_SERVICE_NAME),
+                    handle)
+        session_bus.return_value.get_object.assert_called_once_with(
+            _SERVICE_NAME, '/org/sugarlabs/Test')
+        remote.create.assert_called_once_with(
+            handle.get_dict(), dbus_interface='org.laptop.SingleProcess')
+        return created
+
+    def test_created_in_single_process(self):
+        self.assertTrue(self._create())
+
+    def test_single_process_unreachable(self):
+        error = dbus.DBusException(name='org.freedesktop.DBus.Error.NoReply')
+        self.assertFalse(self._create(error))
@@ -15,11 +15,19 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import os
+import hashlib
+import shutil
+import tempfile
+import zipfile
 import unittest
 import subprocess
+from unittest import mock
 
+from sugar3.bundle import bundleindex
+from sugar3.bundle import activitybundle
+from sugar3.bundle.bundle import ZipExtractException, format_manifest
 from sugar3.bundle.helpers import bundle_from_dir, bundle_from_archive
-from sugar3.bundle.activitybundle import ActivityBundle
+from sugar3.bundle.activitybundle import ActivityBundle, get_bundle_instance
 from sugar3.bundle.contentbundle import ContentBundle
 
 tests_dir = os.path.dirname(__file__)
@@ -27,8 +35,46 @@ data_dir = os.path.join(tests_dir, "data")
 SAMPLE_ACTIVITY_PATH = os.path.join(data_dir, 'sample.activity')
 SAMPLE_CONTENT_PATH = os.path.join(data_dir, 'sample.content')
 
+_old_environ = {}
+
+
+def _set_environ(name, value):
+    if name not in _old_environ:
+        _old_environ[name] = os.environ.get(name)
+    os.environ[name] = value
+
+
+def _restore_environ():
+    for name, value in _old_environ.items():
+        if value is None:
+            del os.environ[name]
+        else:
+            os.environ[name] = value
+    _old_environ.clear()
+
+
+def setUpModule():
+    # keep the bundle index and activities out of the real profile
+    global _home
+    _home = tempfile.mkdtemp()
+    _set_environ('SUGAR_HOME', _home)
+    _set_environ('SUGAR_ACTIVITIES_PATH', os.path.join(_home, 'Activities'))
+    bundleindex._entries.clear()
+
+
+def tearDownModule():
+    bundleindex._entries.clear()
+    _restore_environ()
+    shutil.rmtree(_home)
+
 
 class TestBundle(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        # the trash of installs may still be deleted in the background
+        self.addCleanup(shutil.rmtree, self._temp_dir, True)
+        self._install_dir = os.path.join(self._temp_dir, 'Activities')
+
     def test_bundle_from_dir(self):
         bundle = bundle_from_dir(SAMPLE_ACTIVITY_PATH)
         self.assertIsInstance(bundle, ActivityBundle)
@@ -44,6 +90,383 @@ class TestBundle(unittest.TestCase):
 
     def test_content_bundle_from_archive(self):
         os.chdir(data_dir)
-        subprocess.check_call(["zip", "-r", "sample-1.xol", "sample.content"])
-        bundle = bundle_from_archive("./sample-1.xol")
+        xol_path = os.path.join(self._temp_dir, "sample-1.xol")
+        subprocess.check_call(["zip", "-r", xol_path, "sample.content"])
+        bundle = bundle_from_archive(xol_path)
         self.assertIsInstance(bundle, ContentBundle)
+
+    def _zip_sample_activity(self):
+        xo_path = os.path.join(self._temp_dir, 'Sample-1.xo')
+        with zipfile.ZipFile(xo_path, 'w') as xo:
+            for root, dirs, files in os.walk(SAMPLE_ACTIVITY_PATH):
+                for name in files:
+                    path = os.path.join(root, name)
+                    xo.write(path, os.path.relpath(path, data_dir))
+        return xo_path
+
+    def test_zip_bundle_is_dir(self):
+        bundle = ActivityBundle(self._zip_sample_activity())
+        self.assertTrue(bundle.is_dir(''))
+        self.assertTrue(bundle.is_dir('activity'))
+        self.assertTrue(bundle.is_dir('activity/'))
+        self.assertFalse(bundle.is_dir('activity/activity.info'))
+        self.assertTrue(bundle.is_dir('po'))
+        self.assertFalse(bundle.is_dir('locale'))
+        self.assertTrue(bundle.is_file('activity/activity.info'))
+
+    def test_zip_bundle_extract(self):
+        bundle = ActivityBundle(self._zip_sample_activity())
+
+        progress = []
+        bundle._unzip(self._install_dir, lambda done, total:
+                      progress.append((done, total)))
+
+        install_path = os.path.join(self._install_dir, 'sample.activity')
+        info_path = os.path.join(install_path, 'activity', 'activity.info')
+        with open(info_path, 'rb') as f:
+            self.assertEqual(f.read(),
+                             bundle.get_file_data('activity/activity.info'))
+        self.assertTrue(os.access(os.path.join(install_path, 'setup.py'),
+                                  os.X_OK))
+        self.assertEqual(progress[-1][0], progress[-1][1])
+        self.assertEqual(os.listdir(self._install_dir), ['sample.activity'])
+
+    def test_zip_bundle_extract_stale_temp_dir(self):
+        bundle = ActivityBundle(self._zip_sample_activity())
+
+        stale_dir = os.path.join(self._install_dir, '.sample.activity-stale')
+        os.makedirs(os.path.join(stale_dir, 'sample.activity'))
+        bundle._unzip(self._install_dir)
+
+        self.assertFalse(os.path.exists(stale_dir))
+        self.assertTrue(os.path.isdir(os.path.join(self._install_dir,
+                                                   'sample.activity')))
+
+    def test_uninstall(self):
+        bundle = ActivityBundle(self._zip_sample_activity())
+        bundle._unzip(self._install_dir)
+
+        install_path = os.path.join(self._install_dir, 'sample.activity')
+        bundle._uninstall(install_path)
+        self.assertFalse(os.path.exists(install_path))
+
+    def test_get_bundle_instance(self):
+        xo_path = self._zip_sample_activity()
+
+        bundle = get_bundle_instance(xo_path)
+        self.assertIs(get_bundle_instance(xo_path), bundle)
+
+        os.utime(xo_path, (0, 0))
+        self.assertIsNot(get_bundle_instance(xo_path), bundle)
+
+    def _zip_manifest_bundle(self, name, files, listed=None):
+        """Zip a bundle of the files given, with a manifest of the
+        listed ones, by default the same"""
+        info_name = 'activity/activity.info'
+        with open(os.path.join(SAMPLE_ACTIVITY_PATH, info_name), 'rb') as f:
+            info = f.read()
+        files = dict(files)
+        files[info_name] = info
+        if listed is None:
+            listed = files
+        listed = dict(listed)
+        listed[info_name] = info
+        manifest = dict([(path, hashlib.sha256(data).hexdigest())
+                         for path, data in listed.items()])
+
+        xo_path = os.path.join(self._temp_dir, name)
+        with zipfile.ZipFile(xo_path, 'w') as xo:
+            for path, data in files.items():
+                xo.writestr('sample.activity/' + path, data)
+            xo.writestr('sample.activity/activity/contents',
+                        format_manifest(manifest))
+        return ActivityBundle(xo_path)
+
+    def _read_installed(self, name):
+        path = os.path.join(self._install_dir, 'sample.activity', name)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_delta_install(self):
+        bundle = self._zip_manifest_bundle('Sample-1.xo',
+                                           {'a.py': b'a', 'b.py': b'b'})
+        bundle._unzip(self._install_dir)
+
+        delta = self._zip_manifest_bundle('Sample-2.xo', {'b.py': b'c'},
+                                          {'a.py': b'a', 'b.py': b'c'})
+        delta._unzip(self._install_dir)
+        self.assertEqual(self._read_installed('a.py'), b'a')
+        self.assertEqual(self._read_installed('b.py'), b'c')
+
+        self.assertRaises(ZipExtractException, delta._unzip,
+                          os.path.join(self._temp_dir, 'Other'))
+
+        # a modified copy is neither reused nor left in place
+        path = os.path.join(self._install_dir, 'sample.activity', 'a.py')
+        with open(path, 'wb') as f:
+            f.write(b'modified')
+        self.assertRaises(ZipExtractException, delta._unzip,
+                          self._install_dir)
+        bundle._unzip(self._install_dir)
+        self.assertEqual(self._read_installed('a.py'), b'a')
+
+    def test_upgrade_reuses_unchanged_files(self):
+        self._zip_manifest_bundle(
+            'Sample-1.xo', {'a.py': b'a', 'b.py': b'b'})._unzip(
+                self._install_dir)
+        upgrade = self._zip_manifest_bundle(
+            'Sample-2.xo', {'a.py': b'a', 'b.py': b'c', 'c.py': b'c'})
+
+        extracted = []
+        extract_file = upgrade._extract_file
+
+        def extract_file_cb(zip_file, info, path, mode):
+            extracted.append(info.filename)
+            return extract_file(zip_file, info, path, mode)
+
+        with mock.patch.object(upgrade, '_extract_file', extract_file_cb):
+            upgrade._unzip(self._install_dir)
+
+        self.assertEqual(sorted(extracted),
+                         ['sample.activity/activity/contents',
+                          'sample.activity/b.py', 'sample.activity/c.py'])
+        for name, data in [('a.py', b'a'), ('b.py', b'c'), ('c.py', b'c')]:
+            self.assertEqual(self._read_installed(name), data)
+
+    def test_zip_bundle_icon(self):
+        bundle = ActivityBundle(self._zip_sample_activity())
+
+        icon_path = bundle.get_icon()
+        self.assertEqual(bundle.get_icon(), icon_path)
+        with open(icon_path, 'rb') as f:
+            self.assertEqual(f.read(), bundle.get_icon_data())
+
+
+def _forget_bundle_index():
+    # as a new process would start
+    bundleindex._entries.clear()
+    bundleindex._dirty.clear()
+
+
+class TestBundleIndex(unittest.TestCase):
+    def setUp(self):
+        _forget_bundle_index()
+
+        self._path = os.path.join(os.environ['SUGAR_ACTIVITIES_PATH'],
+                                  'sample.activity')
+        # leave out what building the sample bundle generates
+        shutil.copytree(SAMPLE_ACTIVITY_PATH, self._path,
+                        ignore=shutil.ignore_patterns('locale', 'dist'))
+        self._info_path = os.path.join(self._path, 'activity',
+                                       'activity.info')
+
+    def tearDown(self):
+        _forget_bundle_index()
+        shutil.rmtree(self._path, ignore_errors=True)
+        shutil.rmtree(bundleindex._get_index_dir(), ignore_errors=True)
+
+    def _copy_bundle(self, name):
+        path = os.path.join(os.path.dirname(self._path), name)
+        shutil.copytree(SAMPLE_ACTIVITY_PATH, path)
+        self.addCleanup(shutil.rmtree, path, True)
+        return path
+
+    def test_reuse_parsed_info(self):
+        ActivityBundle(self._path)
+        bundleindex.save()
+        _forget_bundle_index()
+
+        info = bundleindex.get_info(self._path, self._info_path)
+        self.assertEqual(info['bundle_id'], 'org.sugarlabs.Sample')
+
+        info['name'] = 'Indexed'
+        self.assertEqual(ActivityBundle(self._path).get_name(), 'Indexed')
+
+    def test_info_modified(self):
+        ActivityBundle(self._path)
+        bundleindex.get_info(self._path, self._info_path)['name'] = 'Stale'
+
+        stat = os.stat(self._info_path)
+        os.utime(self._info_path, ns=(stat.st_atime_ns,
+                                      stat.st_mtime_ns + 1000000000))
+        self.assertEqual(ActivityBundle(self._path).get_name(), 'Sample')
+
+    def test_not_installed(self):
+        ActivityBundle(SAMPLE_ACTIVITY_PATH)
+        bundleindex.save()
+        self.assertFalse(os.path.exists(bundleindex._get_index_dir()))
+
+    def test_only_own_entry_loaded(self):
+        other_path = self._copy_bundle('other.activity')
+        ActivityBundle(self._path)
+        ActivityBundle(other_path)
+        bundleindex.save()
+        _forget_bundle_index()
+
+        ActivityBundle(self._path)
+        self.assertEqual(list(bundleindex._entries.keys()), [self._path])
+
+    def test_concurrent_writers(self):
+        other_path = self._copy_bundle('other.activity')
+        ActivityBundle(self._path)
+        bundleindex.save()
+
+        # another process, which loaded the index before the save above
+        _forget_bundle_index()
+        ActivityBundle(other_path)
+        bundleindex.save()
+
+        _forget_bundle_index()
+        for path in [self._path, other_path]:
+            info_path = os.path.join(path, 'activity', 'activity.info')
+            self.assertIsNotNone(bundleindex.get_info(path, info_path))
+
+    def test_removed_bundle_pruned(self):
+        ActivityBundle(self._path)
+        shutil.rmtree(self._path)
+        bundleindex.save()
+        self.assertFalse(
+            os.path.exists(bundleindex._get_entry_path(self._path)))
+
+    def test_prune(self):
+        other_path = self._copy_bundle('other.activity')
+        ActivityBundle(self._path)
+        ActivityBundle(other_path)
+        bundleindex.save()
+        _forget_bundle_index()
+
+        shutil.rmtree(self._path)
+        bundleindex.prune()
+        self.assertEqual(os.listdir(bundleindex._get_index_dir()),
+                         [os.path.basename(
+                             bundleindex._get_entry_path(other_path))])
+
+    def test_uninstall_removes_entry(self):
+        ActivityBundle(self._path)
+        bundleindex.save()
+        bundleindex.remove(self._path)
+        bundleindex.save()
+        self.assertEqual(os.listdir(bundleindex._get_index_dir()), [])
+
+    def test_values_not_shared(self):
+        with open(self._info_path, 'a') as f:
+            f.write('mime_types = text/plain\n')
+
+        bundle = ActivityBundle(self._path)
+        bundle.get_mime_types().append('text/x-shared')
+        info = bundleindex.get_info(self._path, self._info_path)
+        self.assertNotIn('text/x-shared', info['mime_types'])
+
+        bundle = ActivityBundle(self._path)
+        bundle.get_mime_types().append('text/x-shared')
+        self.assertNotIn('text/x-shared', info['mime_types'])
+
+
+class TestMimeDatabaseBatch(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('subprocess.call')
+        self._call = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_runs(self):
+        return [args[0][1] for args, kwargs in self._call.call_args_list]
+
+    def test_no_batch(self):
+        activitybundle._update_mime_database('/a')
+        activitybundle._update_mime_database('/a')
+        self.assertEqual(self._get_runs(), ['/a', '/a'])
+
+    def test_nested(self):
+        with activitybundle.mime_database_batch(wait=True):
+            activitybundle._update_mime_database('/a')
+            with activitybundle.mime_database_batch():
+                activitybundle._update_mime_database('/a')
+                activitybundle._update_mime_database('/b')
+            self.assertEqual(self._get_runs(), [])
+            activitybundle._update_mime_database('/b')
+        self.assertEqual(sorted(self._get_runs()), ['/a', '/b'])
+
+    def test_background(self):
+        with mock.patch('threading.Thread') as thread:
+            with activitybundle.mime_database_batch():
+                activitybundle._update_mime_database('/a')
+                activitybundle._update_mime_database('/a')
+        thread.assert_called_once_with(
+            target=activitybundle._run_update_mime_database, args=('/a',))
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(self._get_runs(), [])
+
+
+class TestLanguages(unittest.TestCase):
+    def setUp(self):
+        environ = dict([(envar, '') for envar in
+                        activitybundle._LANGUAGE_ENVARS])
+        for patcher in [
+                mock.patch.dict(os.environ, environ),
+                mock.patch.object(activitybundle, '_languages',
+                                  (None, None))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self._path = os.path.join(temp_dir, 'sample.activity')
+        # leave out what building the sample bundle generates
+        shutil.copytree(SAMPLE_ACTIVITY_PATH, self._path,
+                        ignore=shutil.ignore_patterns('locale', 'dist'))
+        for lang in ['es', 'fr']:
+            os.makedirs(os.path.join(self._path, 'locale', lang))
+        with open(os.path.join(self._path, 'locale', 'es',
+                               'activity.linfo'), 'w') as f:
+            f.write('[Activity]\nname = Muestra\n')
+
+    def test_negotiated_once(self):
+        os.environ['LANG'] = 'es_ES.UTF-8'
+        with mock.patch.object(activitybundle, '_expand_lang',
+                               wraps=activitybundle._expand_lang) as expand:
+            languages = activitybundle._get_languages()
+            activitybundle._get_languages()
+        self.assertEqual(expand.call_count, 1)
+        self.assertEqual(languages[-1], 'es')
+
+    def test_environment_changed(self):
+        os.environ['LANG'] = 'es_ES.UTF-8'
+        self.assertEqual(activitybundle._get_languages()[-1], 'es')
+        for envar in ['LC_MESSAGES', 'LC_ALL', 'LANGUAGE']:
+            os.environ[envar] = 'fr_FR.UTF-8'
+            self.assertEqual(activitybundle._get_languages()[-1], 'fr')
+            os.environ[envar] = 'de_DE.UTF-8'
+            self.assertEqual(activitybundle._get_languages()[-1], 'de')
+
+        os.environ['LANGUAGE'] = 'pt:es'
+        languages = activitybundle._get_languages()
+        self.assertEqual((languages[0][:2], languages[-1]), ('pt', 'es'))
+
+    def test_linfo_path(self):
+        bundle = ActivityBundle(self._path)
+        probed = []
+        is_file = bundle.is_file
+
+        def is_file_cb(path):
+            probed.append(path)
+            return is_file(path)
+
+        with mock.patch.object(bundle, 'is_file', is_file_cb):
+            os.environ['LANGUAGE'] = 'de:fr:es'
+            self.assertEqual(bundle._get_linfo_path(),
+                             os.path.join('locale', 'es', 'activity.linfo'))
+            # de has no locale directory, so it is not probed
+            self.assertEqual(probed,
+                             [os.path.join('locale', lang, 'activity.linfo')
+                              for lang in ['fr', 'es']])
+
+            os.environ['LANGUAGE'] = 'fr'
+            self.assertIsNone(bundle._get_linfo_path())
+            os.environ['LANGUAGE'] = 'de'
+            self.assertIsNone(bundle._get_linfo_path())
+
+    def test_translated_name(self):
+        os.environ['LANGUAGE'] = 'es'
+        self.assertEqual(ActivityBundle(self._path).get_name(), 'Muestra')
+        os.environ['LANGUAGE'] = 'fr'
+        self.assertEqual(ActivityBundle(self._path).get_name(), 'Sample')
@@ -88,6 +88,7 @@ class TestGit(unittest.TestCase):
         stripped_filenames = self._strip_root_dir(filenames)
         expected = self._source_files[:]
         expected.extend(self._get_all_locale_files())
+        expected.append("activity/contents")
         self.assertItemsEqual(stripped_filenames, expected)
 
         os.chdir(cwd)
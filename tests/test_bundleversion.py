@@ -0,0 +1,66 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import unittest
+
+from sugar3.bundle.bundleversion import NormalizedVersion, \
+    InvalidVersionError, sort_key, find_updates
+
+
+class _Bundle(object):
+    def __init__(self, bundle_id, version):
+        self._bundle_id = bundle_id
+        self._version = version
+
+    def get_bundle_id(self):
+        return self._bundle_id
+
+    def get_activity_version(self):
+        return self._version
+
+
+class TestBundleVersion(unittest.TestCase):
+    def test_compare(self):
+        a = NormalizedVersion('157.3')
+        b = NormalizedVersion('201.2')
+        self.assertTrue(a < b)
+        self.assertTrue(a <= b)
+        self.assertTrue(b > a)
+        self.assertTrue(b >= a)
+        self.assertTrue(a != b)
+        self.assertEqual(NormalizedVersion('1.0'), NormalizedVersion('1'))
+        self.assertEqual(NormalizedVersion('1.2-peru').parts, [1, 2])
+
+    def test_invalid(self):
+        for version in ['1.02.5', '1.2.', '1.2peru', 3]:
+            self.assertRaises(InvalidVersionError, NormalizedVersion, version)
+            self.assertRaises(InvalidVersionError, sort_key, version)
+
+    def test_sort_key(self):
+        self.assertEqual(sorted(['10', '9.10', '9.2', '9.1.0'], key=sort_key),
+                         ['9.1.0', '9.2', '9.10', '10'])
+
+    def test_find_updates(self):
+        bundles = [_Bundle('org.sugarlabs.A', '1'),
+                   _Bundle('org.sugarlabs.B', '2'),
+                   _Bundle('org.sugarlabs.C', '3')]
+        catalog = [('org.sugarlabs.A', '2', 'a-2.xo'),
+                   ('org.sugarlabs.A', '1.5', 'a-1.5.xo'),
+                   ('org.sugarlabs.B', '2.0', 'b-2.xo'),
+                   ('org.sugarlabs.C', 'invalid', 'c.xo')]
+
+        updates = find_updates(bundles, catalog)
+        self.assertEqual(updates, [(bundles[0], '2', 'a-2.xo')])
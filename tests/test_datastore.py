@@ -0,0 +1,488 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+import dbus
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from sugar3.datastore import datastore
+from sugar3.test import datastore as stand_in
+
+_TIMEOUT = 5
+
+_bus = None
+_process = None
+
+
+def setUpModule():
+    global _bus, _process
+
+    DBusGMainLoop(set_as_default=True)
+    _bus = stand_in.private_session_bus()
+    _bus.__enter__()
+    try:
+        _process = stand_in.start_data_store()
+    except BaseException:
+        _bus.__exit__(None, None, None)
+        raise
+
+
+def tearDownModule():
+    _process.terminate()
+    _process.wait()
+    _bus.__exit__(None, None, None)
+
+
+def _get_test_interface():
+    return dbus.Interface(
+        dbus.SessionBus().get_object(stand_in.DS_DBUS_SERVICE,
+                                     stand_in.DS_DBUS_PATH),
+        stand_in.TEST_DBUS_INTERFACE)
+
+
+def _populate(count, **props):
+    props.setdefault('activity', 'org.sugarlabs.Test')
+    return [str(uid) for uid in _get_test_interface().populate(props, count)]
+
+
+def _wait_for(condition):
+    context = GLib.MainContext.default()
+    deadline = time.time() + _TIMEOUT
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('Timed out')
+        context.iteration(False)
+        time.sleep(0.001)
+
+
+def _write_file(directory, data):
+    fd, path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
+
+
+class _Handlers(object):
+    def __init__(self):
+        self.replies = []
+        self.errors = []
+
+    def reply_cb(self, *args):
+        self.replies.append(args)
+
+    def error_cb(self, error):
+        self.errors.append(error)
+
+    def done(self):
+        return self.replies or self.errors
+
+
+class TestMetadataCache(unittest.TestCase):
+    def test_lru(self):
+        cache = datastore._MetadataCache(2)
+        cache.set('a', {'title': 'A'})
+        cache.set('b', {'title': 'B'})
+        cache.get('a')
+        cache.set('c', {'title': 'C'})
+        self.assertEqual(cache.get('a'), {'title': 'A'})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), {'title': 'C'})
+
+    def test_copies(self):
+        cache = datastore._MetadataCache(2)
+        properties = {'title': 'A'}
+        cache.set('a', properties)
+        properties['title'] = 'B'
+        cache.get('a')['title'] = 'C'
+        self.assertEqual(cache.get('a'), {'title': 'A'})
+
+
+class _DataStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        datastore._metadata_cache.clear()
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._temp_dir)
+
+
+class TestGet(_DataStoreTestCase):
+    def test_get(self):
+        uid = _populate(1, title='Entry')[0]
+        ds_object = datastore.get(uid)
+        self.assertEqual(ds_object.metadata['title'], 'Entry')
+        ds_object.destroy()
+        self.assertEqual(datastore._metadata_cache.get(uid)['title'],
+                         'Entry')
+
+    def test_get_async_block(self):
+        uid = _populate(1, title='Entry')[0]
+        handlers = _Handlers()
+        dispatched = []
+        source_id = GLib.idle_add(lambda: dispatched.append(True))
+        try:
+            call = datastore.get(uid, reply_handler=handlers.reply_cb,
+                                 error_handler=handlers.error_cb)
+            call.block()
+        finally:
+            GLib.source_remove(source_id)
+        self.assertEqual(dispatched, [])
+
+        ds_object, = handlers.replies[0]
+        self.assertEqual(ds_object.metadata['title'], 'Entry')
+        ds_object.destroy()
+
+        self.assertIsNone(datastore.get(uid, reply_handler=handlers.reply_cb,
+                                        error_handler=handlers.error_cb))
+        handlers.replies[1][0].destroy()
+
+    def test_get_invalidated_by_update(self):
+        uid = _populate(1, title='Entry')[0]
+        datastore.get(uid).destroy()
+
+        _get_test_interface().emit_updated([uid])
+        _wait_for(lambda: datastore._metadata_cache.get(uid) is None)
+
+    def test_write_invalidates(self):
+        ds_object = datastore.create()
+        ds_object.metadata['title'] = 'Old'
+        datastore.write(ds_object)
+        uid = ds_object.object_id
+        datastore.get(uid).destroy()
+
+        ds_object.metadata['title'] = 'New'
+        datastore.write(ds_object)
+        self.assertEqual(datastore.get(uid).metadata['title'], 'New')
+        ds_object.destroy()
+
+
+class TestUpdates(_DataStoreTestCase):
+    def test_updated_dispatched_to_ds_objects(self):
+        uid = _populate(1, title='Entry')[0]
+        ds_objects = [datastore.get(uid) for i in range(3)]
+        self.assertEqual(len(datastore._ds_objects[uid]), 3)
+
+        other = datastore.get(uid)
+        other.metadata['title'] = 'Changed'
+        datastore.write(other, update_mtime=False)
+        for ds_object in ds_objects:
+            _wait_for(lambda: ds_object.metadata['title'] == 'Changed')
+            ds_object.destroy()
+        other.destroy()
+
+    def test_ds_objects_registry(self):
+        uid = _populate(1)[0]
+        ds_object = datastore.get(uid)
+        self.assertIn(uid, datastore._ds_objects)
+        ds_object.destroy()
+        self.assertNotIn(uid, datastore._ds_objects)
+
+
+class TestFindPaged(_DataStoreTestCase):
+    def test_find_paged(self):
+        uids = _populate(250, activity='org.sugarlabs.Paged')
+        paged = datastore.find_paged({'activity': 'org.sugarlabs.Paged'},
+                                     page_size=100, properties=['uid'])
+        pages = list(paged.pages())
+        self.assertEqual([len(page) for page in pages], [100, 100, 50])
+        self.assertEqual(paged.get_total_count(), 250)
+
+        found = [ds_object.object_id for page in pages for ds_object in page]
+        self.assertEqual(sorted(found), sorted(uids))
+        for page in pages:
+            for ds_object in page:
+                ds_object.destroy()
+
+    def test_find_paged_cancel(self):
+        _populate(30, activity='org.sugarlabs.Cancelled')
+        paged = datastore.find_paged(
+            {'activity': 'org.sugarlabs.Cancelled'}, page_size=10)
+        first = paged.next_page()
+        self.assertEqual(len(first), 10)
+        paged.cancel()
+        self.assertIsNone(paged.next_page())
+        for ds_object in first:
+            ds_object.destroy()
+
+    def test_find_paged_sorting(self):
+        _populate(25, activity='org.sugarlabs.Sorted')
+        paged = datastore.find_paged({'activity': 'org.sugarlabs.Sorted'},
+                                     sorting=['-timestamp'], page_size=10,
+                                     properties=['uid', 'timestamp'])
+        ds_objects = list(paged)
+        timestamps = [ds_object.metadata['timestamp']
+                      for ds_object in ds_objects]
+        self.assertEqual(len(timestamps), 25)
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+        for ds_object in ds_objects:
+            ds_object.destroy()
+
+
+class TestGetMany(_DataStoreTestCase):
+    def test_get_many(self):
+        uids = _populate(250)
+        cached = datastore.get(uids[10])
+        requested = [uids[10], 'missing'] + list(reversed(uids)) + [uids[0]]
+
+        ds_objects = datastore.get_many(requested)
+        self.assertEqual([ds_object.object_id for ds_object in ds_objects],
+                         [uids[10]] + [uid for uid in reversed(uids)
+                                       if uid != uids[10]])
+        for ds_object in ds_objects:
+            self.assertEqual(ds_object.metadata['activity'],
+                             'org.sugarlabs.Test')
+            ds_object.destroy()
+        cached.destroy()
+
+    def test_get_many_does_not_run_main_loop(self):
+        uids = _populate(150)
+        dispatched = []
+        source_id = GLib.idle_add(lambda: dispatched.append(True))
+        try:
+            for ds_object in datastore.get_many(uids):
+                ds_object.destroy()
+        finally:
+            GLib.source_remove(source_id)
+        self.assertEqual(dispatched, [])
+
+    def test_get_many_properties(self):
+        uids = _populate(3)
+        ds_objects = datastore.get_many(uids, properties=['title'])
+        for ds_object in ds_objects:
+            self.assertIn('title', ds_object.metadata)
+            self.assertNotIn('timestamp', ds_object.metadata)
+            ds_object.destroy()
+
+    def test_get_many_async(self):
+        uids = _populate(150)
+        handlers = _Handlers()
+        datastore.get_many(uids, reply_handler=handlers.reply_cb,
+                           error_handler=handlers.error_cb)
+        _wait_for(handlers.done)
+
+        ds_objects, = handlers.replies[0]
+        self.assertEqual([ds_object.object_id for ds_object in ds_objects],
+                         uids)
+        for ds_object in ds_objects:
+            ds_object.destroy()
+
+    def test_get_many_empty(self):
+        self.assertEqual(datastore.get_many([]), [])
+        self.assertEqual(datastore.get_many(['missing']), [])
+
+
+class TestPreview(_DataStoreTestCase):
+    def test_get_preview(self):
+        uid = _populate(1, preview=dbus.ByteArray(b'PNG'))[0]
+        ds_objects, total_count = datastore.find({'uid': uid},
+                                                 properties=['uid', 'title'])
+        ds_object = ds_objects[0]
+        self.assertNotIn('preview', ds_object.metadata)
+        self.assertEqual(bytes(ds_object.get_preview()), b'PNG')
+        ds_object.destroy()
+
+    def test_get_preview_missing(self):
+        uid = _populate(1)[0]
+        self.assertIsNone(datastore.get_preview(uid))
+        self.assertIsNone(datastore.get_preview('missing'))
+
+    def test_get_preview_kept(self):
+        uid = _populate(1, preview=dbus.ByteArray(b'PNG'))[0]
+        ds_objects, total_count = datastore.find({'uid': uid},
+                                                 properties=['uid'])
+        ds_object = ds_objects[0]
+        updates = []
+        ds_object.metadata.connect('updated',
+                                   lambda metadata: updates.append(True))
+        ds_object.get_preview()
+        self.assertEqual(bytes(ds_object.metadata['preview']), b'PNG')
+        self.assertEqual(updates, [])
+        ds_object.destroy()
+
+
+class TestMetadata(_DataStoreTestCase):
+    def test_decode(self):
+        metadata = datastore.DSMetadata(
+            {'title': dbus.ByteArray(b'Title'),
+             'preview': dbus.ByteArray(b'\x89PNG\xff'),
+             'keep': 1})
+        self.assertEqual(metadata['title'], 'Title')
+        self.assertEqual(bytes(metadata['preview']), b'\x89PNG\xff')
+        self.assertEqual(metadata['keep'], 1)
+
+    def test_update_emits_once(self):
+        metadata = datastore.DSMetadata({'title': 'Title'})
+        updates = []
+        metadata.connect('updated', lambda metadata: updates.append(True))
+        metadata.update({'title': 'New', 'tags': 'tag'})
+        self.assertEqual(updates, [True])
+        metadata.update({'title': 'New', 'tags': 'tag'})
+        self.assertEqual(updates, [True])
+
+    def test_find_metadata_built_on_access(self):
+        uid = _populate(1, title='Entry')[0]
+        ds_objects, total_count = datastore.find(
+            {'uid': uid}, properties=['uid', 'title'])
+        ds_object = ds_objects[0]
+        self.assertIsNone(ds_object._metadata)
+        self.assertEqual(ds_object.metadata['title'], 'Entry')
+        self.assertIsInstance(ds_object._metadata, datastore.DSMetadata)
+        ds_object.destroy()
+
+
+class TestWrite(_DataStoreTestCase):
+    def test_write_async(self):
+        ds_object = datastore.create()
+        ds_object.metadata['title'] = 'First'
+        handlers = _Handlers()
+        datastore.write(ds_object, reply_handler=handlers.reply_cb,
+                        error_handler=handlers.error_cb)
+        self.assertIsNone(ds_object.object_id)
+
+        ds_object.metadata['title'] = 'Second'
+        datastore.write(ds_object, reply_handler=handlers.reply_cb,
+                        error_handler=handlers.error_cb)
+        _wait_for(lambda: len(handlers.replies) == 2)
+
+        self.assertEqual(handlers.errors, [])
+        uid = ds_object.object_id
+        self.assertIsNotNone(uid)
+        datastore._metadata_cache.clear()
+        self.assertEqual(datastore.get(uid).metadata['title'], 'Second')
+        ds_object.destroy()
+
+    def test_write_waits_for_pending_create(self):
+        ds_object = datastore.create()
+        handlers = _Handlers()
+        datastore.write(ds_object, reply_handler=handlers.reply_cb,
+                        error_handler=handlers.error_cb)
+        self.assertIsNotNone(ds_object.wait_for_create())
+
+        uid = ds_object.object_id
+        ds_object.metadata['title'] = 'Updated'
+        datastore.write(ds_object)
+        self.assertEqual(ds_object.object_id, uid)
+        self.assertEqual(len(handlers.replies), 1)
+        ds_object.destroy()
+
+    def test_write_async_failure_releases_files(self):
+        ds_object = datastore.create()
+        ds_object.file_path = os.path.join(self._temp_dir, 'missing')
+        handlers = _Handlers()
+        datastore.write(ds_object, transfer_ownership=True,
+                        reply_handler=handlers.reply_cb,
+                        error_handler=handlers.error_cb)
+
+        queued_path = _write_file(self._temp_dir, b'queued')
+        ds_object.file_path = queued_path
+        datastore.write(ds_object, transfer_ownership=True,
+                        reply_handler=handlers.reply_cb,
+                        error_handler=handlers.error_cb)
+
+        self.assertIsNone(ds_object.wait_for_create())
+        self.assertEqual(len(handlers.errors), 2)
+        self.assertFalse(os.path.exists(queued_path))
+        ds_object.destroy()
+
+
+class TestSignals(_DataStoreTestCase):
+    def test_signals_coalesced(self):
+        uid = _populate(1)[0]
+        received = []
+
+        def updated_cb(sender, object_id, metadata, **kwargs):
+            received.append(object_id)
+
+        datastore.updated.connect(updated_cb)
+        try:
+            _get_test_interface().emit_updated([uid] * 5)
+            _wait_for(lambda: received)
+            # let later signals in, if any were sent
+            end = time.time() + datastore._SIGNALS_COALESCE_DELAY / 500.
+            _wait_for(lambda: time.time() > end)
+        finally:
+            datastore.updated.disconnect(updated_cb)
+        self.assertEqual(received, [uid])
+
+    def test_created_signal(self):
+        received = []
+
+        def created_cb(sender, object_id, metadata, **kwargs):
+            received.append((object_id, metadata['title']))
+
+        datastore.created.connect(created_cb)
+        try:
+            ds_object = datastore.create()
+            ds_object.metadata['title'] = 'Created'
+            datastore.write(ds_object)
+            _wait_for(lambda: ds_object.object_id in dict(received))
+        finally:
+            datastore.created.disconnect(created_cb)
+        self.assertIn((ds_object.object_id, 'Created'), received)
+        ds_object.destroy()
+
+    def test_signals_coalesced_per_entry(self):
+        uids = _populate(3)
+        received = []
+
+        def updated_cb(sender, object_id, metadata, **kwargs):
+            received.append(object_id)
+
+        datastore.updated.connect(updated_cb)
+        try:
+            _get_test_interface().emit_updated(uids * 3)
+            _wait_for(lambda: len(received) >= len(uids))
+            end = time.time() + datastore._SIGNALS_COALESCE_DELAY / 500.
+            _wait_for(lambda: time.time() > end)
+        finally:
+            datastore.updated.disconnect(updated_cb)
+        self.assertEqual(sorted(received), sorted(uids))
+
+
+class TestCopy(_DataStoreTestCase):
+    def test_clone_file(self):
+        path = _write_file(self._temp_dir, b'data' * 1024)
+        clone_path = datastore._clone_file(path)
+        self.assertNotEqual(clone_path, path)
+        self.assertEqual(os.path.dirname(clone_path), self._temp_dir)
+        with open(clone_path, 'rb') as f:
+            self.assertEqual(f.read(), b'data' * 1024)
+
+    def test_copy(self):
+        ds_object = datastore.create()
+        ds_object.metadata['title'] = 'Original'
+        ds_object.metadata['mime_type'] = 'text/plain'
+        path = _write_file(self._temp_dir, b'contents')
+        ds_object.file_path = path
+        datastore.write(ds_object)
+
+        exported = datastore.get(ds_object.object_id)
+        new_ds_object = datastore.copy(exported, '/')
+        self.assertNotEqual(new_ds_object.object_id, ds_object.object_id)
+        self.assertEqual(new_ds_object.metadata['suggested_filename'],
+                         'Original.txt')
+
+        copied = datastore.get(new_ds_object.object_id)
+        with open(copied.file_path, 'rb') as f:
+            self.assertEqual(f.read(), b'contents')
+        for each in [ds_object, exported, new_ds_object, copied]:
+            each.destroy()